@@ -7,11 +7,19 @@ import os
 import sys
 import yaml
 import re
+import hashlib
+import pickle
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 from error_types import ErrorHandler, ConfigError, ErrorSeverity
 import logging
 
+# libyamlが利用可能な場合はCローダーを使用
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 
 class ConfigValidationError(Exception):
     """設定検証エラー"""
@@ -33,7 +41,12 @@ class ConfigManager:
                 r'.*#.*',           # アンカーリンク
                 r'.*/search\.html', # 検索ページ
                 r'.*/genindex\.html' # インデックスページ
-            ]
+            ],
+            'state_db': ':memory:',
+            'max_page_bytes': 10 * 1024 * 1024,
+            'concurrency': 1,
+            'per_host_concurrency': 2,
+            'page_cache_db': None
         },
         'extractor': {
             'content_selector': 'main'
@@ -44,7 +57,11 @@ class ConfigManager:
             'download_images': True
         },
         'execution': {
-            'request_delay': 1.0
+            'request_delay': 1.0,
+            'request_burst': 1,
+            'convert_processes': 0,
+            'enable_dedup': False,
+            'dedup_threshold': 0.9
         },
         'retry': {
             'max_retries': 3,
@@ -57,8 +74,11 @@ class ConfigManager:
         'recovery': {
             'enable_recovery': True,
             'save_interval': 10,
+            'save_interval_seconds': 30.0,
             'recovery_file': './recovery_state.json',
-            'auto_resume': True
+            'auto_resume': True,
+            'compress_state': True,
+            'storage': 'json'
         },
         'logging': {
             'console_level': 'INFO',
@@ -81,8 +101,13 @@ class ConfigManager:
         'output.base_dir'
     ]
     
-    def __init__(self, config_path: str = "config.yaml"):
+    # 解析済み設定キャッシュの既定の保存先
+    DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'doc_to_md'
+    
+    def __init__(self, config_path: str = "config.yaml", cache_dir: Optional[str] = None):
         self.config_path = config_path
+        # 指定された場合のみ解析済みの設定をキャッシュする
+        self.cache_dir = Path(cache_dir) if cache_dir else None
         
         # ログとエラーハンドラーの初期化
         self.logger = logging.getLogger('config_manager')
@@ -101,8 +126,16 @@ class ConfigManager:
             raise FileNotFoundError(f"設定ファイル '{self.config_path}' が見つかりません")
         
         try:
+            stat = os.stat(self.config_path)
+            cached = self._load_cached_config(stat)
+            if cached is not None:
+                return cached
+            
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f) or {}
+                user_config = yaml.load(f, Loader=SafeLoader) or {}
+            
+            self._save_cached_config(stat, user_config)
+            return user_config
         except yaml.YAMLError as e:
             error = ConfigError(
                 message=f"設定ファイルの読み込みに失敗しました: {e}",
@@ -120,6 +153,44 @@ class ConfigManager:
             self.error_handler.handle_error(error)
             raise ConfigValidationError(f"設定ファイルの読み込み中にエラーが発生しました: {e}") from e
     
+    def _cache_file_path(self) -> Path:
+        """設定ファイルに対応するキャッシュファイルのパス"""
+        key = hashlib.sha1(os.path.abspath(self.config_path).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.pkl"
+    
+    def _load_cached_config(self, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        """設定ファイルが更新されていなければキャッシュから読み込む"""
+        if self.cache_dir is None:
+            return None
+        
+        try:
+            with open(self._cache_file_path(), 'rb') as f:
+                mtime_ns, size, user_config = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, ValueError, TypeError):
+            return None
+        
+        if (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        
+        self.logger.debug("キャッシュから設定を読み込みました: %s", self.config_path)
+        return user_config
+    
+    def _save_cached_config(self, stat: os.stat_result, user_config: Dict[str, Any]):
+        """解析済みの設定をキャッシュに保存（失敗しても処理は継続）"""
+        if self.cache_dir is None:
+            return
+        
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            cache_file = self._cache_file_path()
+            temp_file = cache_file.with_suffix('.tmp')
+            with open(temp_file, 'wb') as f:
+                pickle.dump((stat.st_mtime_ns, stat.st_size, user_config), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            self.logger.debug("設定キャッシュの保存に失敗しました: %s", e)
+    
     def _merge_with_defaults(self, user_config: Dict[str, Any]) -> Dict[str, Any]:
         """ユーザー設定とデフォルト設定をマージ"""
         def deep_merge(default: Dict, user: Dict) -> Dict:
@@ -166,11 +237,20 @@ class ConfigManager:
             ('target_site.allowed_domain', str),
             ('crawler.navigation_selector', str),
             ('crawler.exclude_patterns', list),
+            ('crawler.state_db', str),
+            ('crawler.max_page_bytes', int),
+            ('crawler.concurrency', int),
+            ('crawler.per_host_concurrency', int),
+            ('crawler.page_cache_db', str),
             ('extractor.content_selector', str),
             ('output.base_dir', str),
             ('output.image_dir_name', str),
             ('output.download_images', bool),
             ('execution.request_delay', (int, float)),
+            ('execution.request_burst', int),
+            ('execution.convert_processes', int),
+            ('execution.enable_dedup', bool),
+            ('execution.dedup_threshold', (int, float)),
             ('retry.max_retries', int),
             ('retry.backoff_factor', (int, float)),
             ('retry.initial_delay', (int, float)),
@@ -179,8 +259,11 @@ class ConfigManager:
             ('retry.skip_after_failures', int),
             ('recovery.enable_recovery', bool),
             ('recovery.save_interval', int),
+            ('recovery.save_interval_seconds', (int, float)),
             ('recovery.recovery_file', str),
             ('recovery.auto_resume', bool),
+            ('recovery.compress_state', bool),
+            ('recovery.storage', str),
             ('logging.console_level', str),
             ('logging.file_level', str),
             ('logging.log_dir', str),
@@ -245,6 +328,33 @@ class ConfigManager:
                 self.error_handler.handle_error(error)
                 raise ConfigValidationError("request_delayは60秒以下である必要があります")
         
+        request_burst = self._get_nested_value(config, 'execution.request_burst')
+        if request_burst is not None and request_burst < 1:
+            error = ConfigError(
+                message="request_burstは1以上である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("request_burstは1以上である必要があります")
+        
+        convert_processes = self._get_nested_value(config, 'execution.convert_processes')
+        if convert_processes is not None and convert_processes < 0:
+            error = ConfigError(
+                message="convert_processesは0以上である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("convert_processesは0以上である必要があります")
+        
+        dedup_threshold = self._get_nested_value(config, 'execution.dedup_threshold')
+        if dedup_threshold is not None and not 0 < dedup_threshold <= 1:
+            error = ConfigError(
+                message="dedup_thresholdは0より大きく1以下である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("dedup_thresholdは0より大きく1以下である必要があります")
+        
         # リトライ設定の値チェック
         max_retries = self._get_nested_value(config, 'retry.max_retries')
         if max_retries is not None:
@@ -309,6 +419,15 @@ class ConfigManager:
             self.error_handler.handle_error(error)
             raise ConfigValidationError("recovery.save_intervalは1以上100以下である必要があります")
         
+        save_interval_seconds = self._get_nested_value(config, 'recovery.save_interval_seconds')
+        if save_interval_seconds is not None and save_interval_seconds < 0:
+            error = ConfigError(
+                message="recovery.save_interval_secondsは0以上である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("recovery.save_interval_secondsは0以上である必要があります")
+        
         recovery_file = self._get_nested_value(config, 'recovery.recovery_file')
         if recovery_file is not None and not recovery_file.strip():
             error = ConfigError(
@@ -318,6 +437,60 @@ class ConfigManager:
             self.error_handler.handle_error(error)
             raise ConfigValidationError("recovery.recovery_fileは空文字列にできません")
         
+        storage = self._get_nested_value(config, 'recovery.storage')
+        if storage is not None and storage not in ('json', 'sqlite'):
+            error = ConfigError(
+                message="recovery.storageは'json'または'sqlite'である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("recovery.storageは'json'または'sqlite'である必要があります")
+        
+        page_cache_db = self._get_nested_value(config, 'crawler.page_cache_db')
+        if page_cache_db is not None and not page_cache_db.strip():
+            error = ConfigError(
+                message="crawler.page_cache_dbは空文字列にできません",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("crawler.page_cache_dbは空文字列にできません")
+        
+        state_db = self._get_nested_value(config, 'crawler.state_db')
+        if state_db is not None and not state_db.strip():
+            error = ConfigError(
+                message="crawler.state_dbは空文字列にできません",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("crawler.state_dbは空文字列にできません")
+        
+        max_page_bytes = self._get_nested_value(config, 'crawler.max_page_bytes')
+        if max_page_bytes is not None and max_page_bytes <= 0:
+            error = ConfigError(
+                message="crawler.max_page_bytesは正の値である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("crawler.max_page_bytesは正の値である必要があります")
+        
+        concurrency = self._get_nested_value(config, 'crawler.concurrency')
+        if concurrency is not None and concurrency < 1:
+            error = ConfigError(
+                message="crawler.concurrencyは1以上である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("crawler.concurrencyは1以上である必要があります")
+        
+        per_host_concurrency = self._get_nested_value(config, 'crawler.per_host_concurrency')
+        if per_host_concurrency is not None and per_host_concurrency < 1:
+            error = ConfigError(
+                message="crawler.per_host_concurrencyは1以上である必要があります",
+                severity=ErrorSeverity.CRITICAL
+            )
+            self.error_handler.handle_error(error)
+            raise ConfigValidationError("crawler.per_host_concurrencyは1以上である必要があります")
+        
         # 除外パターンの正規表現チェック
         exclude_patterns = self._get_nested_value(config, 'crawler.exclude_patterns')
         if exclude_patterns:
@@ -4,26 +4,80 @@ HTMLからMarkdown変換機能
 
 import os
 import re
+import hashlib
 import requests
 import logging
+import threading
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 import html2text
-from typing import Optional, Dict, Any
-from error_types import ErrorHandler, ContentExtractionError, FileSystemError, ErrorSeverity
+from typing import Optional, Dict, Any, List, Set, Tuple
+from error_types import ErrorHandler, ErrorType, ContentExtractionError, FileSystemError, ErrorSeverity
+
+try:
+    from datasketch import MinHash, MinHashLSH  # 任意依存: datasketch
+except ImportError:
+    MinHash = MinHashLSH = None
+
+
+class ContentDeduplicator:
+    """本文テキストによる重複ページの検出
+    
+    空白を正規化した本文のハッシュで完全一致を検出し、datasketchが導入されていれば
+    MinHash LSHでJaccard類似度がthreshold以上のページも重複とみなす。複数スレッドから呼び出し可能。
+    """
+    
+    NUM_PERM = 128
+    SHINGLE_SIZE = 3  # 単語n-gramの長さ
+    
+    def __init__(self, threshold: float = 0.9):
+        self._digests: Dict[bytes, str] = {}  # 本文ハッシュ -> 最初に見つかったURL
+        self._lsh = MinHashLSH(threshold=threshold, num_perm=self.NUM_PERM) if MinHashLSH else None
+        self._lock = threading.Lock()
+    
+    def check(self, url: str, text: str) -> Optional[str]:
+        """既出の本文と重複していればそのURLを返し、そうでなければ登録してNoneを返す"""
+        words = text.split()
+        digest = hashlib.blake2b(' '.join(words).encode('utf-8'), digest_size=16).digest()
+        minhash = self._minhash(words) if self._lsh is not None else None
+        
+        with self._lock:
+            duplicate_of = self._digests.get(digest)
+            if duplicate_of is None and minhash is not None:
+                candidates = self._lsh.query(minhash)
+                if candidates:
+                    duplicate_of = candidates[0]
+            if duplicate_of is not None:
+                return duplicate_of
+            
+            self._digests[digest] = url
+            if minhash is not None:
+                self._lsh.insert(url, minhash)
+        return None
+    
+    def _minhash(self, words: List[str]) -> 'MinHash':
+        """単語n-gramの集合からMinHashを計算"""
+        minhash = MinHash(num_perm=self.NUM_PERM)
+        size = self.SHINGLE_SIZE
+        shingles = {' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        minhash.update_batch([shingle.encode('utf-8') for shingle in shingles])
+        return minhash
 
 
 class MarkdownConverter:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self._setup_html2text()
+        # HTML2Textは変換中の状態をインスタンスに持つため、変換ワーカーのスレッドごとに生成する
+        self._local = threading.local()
         self._setup_logging()
         self._setup_session()
         
         # エラーハンドラーの初期化
         self.error_handler = ErrorHandler(self.logger)
         
+        self._freeze_config()
+        
         # 統計情報
         self.stats = {
             'total_processed': 0,
@@ -32,29 +86,69 @@ class MarkdownConverter:
             'images_downloaded': 0,
             'images_failed': 0
         }
+        # process_pageは複数の変換ワーカーから呼ばれるため、統計の更新はロックで保護する
+        self._stats_lock = threading.Lock()
         
-    def _setup_html2text(self):
+    def _get_html2text(self) -> html2text.HTML2Text:
+        """現在のスレッド用のHTML2Textインスタンスを取得（初回呼び出し時に生成）"""
+        converter = getattr(self._local, 'html2text', None)
+        if converter is None:
+            converter = self._create_html2text()
+            self._local.html2text = converter
+        return converter
+    
+    def _create_html2text(self) -> html2text.HTML2Text:
         """html2textの設定"""
-        self.html2text = html2text.HTML2Text()
+        converter = html2text.HTML2Text()
         
         # 基本設定
-        self.html2text.ignore_links = False
-        self.html2text.ignore_images = False
-        self.html2text.body_width = 0  # 行の折り返しを無効化
-        self.html2text.unicode_snob = True
-        self.html2text.escape_snob = True
+        converter.ignore_links = False
+        converter.ignore_images = False
+        converter.body_width = 0  # 行の折り返しを無効化
+        converter.unicode_snob = True
+        converter.escape_snob = True
         
         # マークダウン出力の改善
-        self.html2text.mark_code = True
-        self.html2text.wrap_links = False
-        self.html2text.bypass_tables = False
-        self.html2text.ignore_emphasis = False
-        self.html2text.skip_internal_links = False
+        converter.mark_code = True
+        converter.wrap_links = False
+        converter.bypass_tables = False
+        converter.ignore_emphasis = False
+        converter.skip_internal_links = False
         
         # リスト処理の改善
-        self.html2text.ul_item_mark = '-'
-        self.html2text.emphasis_mark = '*'
-        self.html2text.strong_mark = '**'
+        converter.ul_item_mark = '-'
+        converter.emphasis_mark = '*'
+        converter.strong_mark = '**'
+        return converter
+    
+    def _count(self, key: str):
+        """統計カウンタを1つ増やす"""
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def _freeze_config(self):
+        """ページごとに参照する設定値を一度だけ解決してインスタンス属性に保持"""
+        self._content_selector = self._get_config('extractor.content_selector', 'main')
+        self._download_images = self._get_config('output.download_images', True)
+        
+        # 出力先のパスも一度だけ構築する
+        output_config = self._get_config('output', {})
+        self._base_dir = Path(output_config.get('base_dir', './output'))
+        self._image_dir_name = output_config.get('image_dir_name', 'images')
+        self._image_dir = self._base_dir / self._image_dir_name
+        # 作成済みのディレクトリ（ページごとのmkdir呼び出しを省く）
+        self._created_dirs: Set[Path] = set()
+        
+        # 重複ページの検出（有効な場合のみ）
+        self._deduplicator: Optional[ContentDeduplicator] = None
+        if self._get_config('execution.enable_dedup', False):
+            self._deduplicator = ContentDeduplicator(self._get_config('execution.dedup_threshold', 0.9))
+    
+    def _ensure_dir(self, directory: Path):
+        """ディレクトリを作成（作成済みのものは何もしない）"""
+        if directory not in self._created_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(directory)
     
     def _setup_logging(self):
         """ログの設定"""
@@ -85,7 +179,12 @@ class MarkdownConverter:
             backoff_factor=0.5,
             status_forcelist=[429, 500, 502, 503, 504],
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # 画像は同一ホスト（CDN等）から連続して取得することが多いため、接続プールを確保して再利用する
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=20,
+            max_retries=retry_strategy,
+        )
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
@@ -103,10 +202,24 @@ class MarkdownConverter:
         """HTMLからメインコンテンツを抽出"""
         try:
             soup = BeautifulSoup(html_content, 'lxml')
-            
+        except Exception as e:
+            error = ContentExtractionError(
+                message="HTMLの解析に失敗しました",
+                url=url,
+                severity=ErrorSeverity.MEDIUM,
+                original_exception=e
+            )
+            self.error_handler.handle_error(error)
+            return None
+        
+        return self._extract_content_from_soup(soup, url)
+    
+    def _extract_content_from_soup(self, soup: BeautifulSoup, url: str = "unknown") -> Optional[str]:
+        """解析済みのページからメインコンテンツを抽出（不要な要素はsoupから除去される）"""
+        try:
             # コンテンツセレクターで指定された要素を取得
-            content_selector = self._get_config('extractor.content_selector', 'main')
-            self.logger.debug(f"コンテンツセレクター: {content_selector}")
+            content_selector = self._content_selector
+            self.logger.debug("コンテンツセレクター: %s", content_selector)
             
             content_elements = soup.select(content_selector)
             
@@ -165,6 +278,8 @@ class MarkdownConverter:
         try:
             soup = BeautifulSoup(html_content, 'lxml')
             
+            download_images = self._download_images
+            
             for img in soup.find_all('img'):
                 src = img.get('src')
                 if not src:
@@ -174,21 +289,19 @@ class MarkdownConverter:
                 try:
                     absolute_url = urljoin(base_url, src)
                 except Exception as e:
-                    self.logger.warning(f"URL結合エラー: {base_url} + {src}: {e}")
+                    self.logger.warning("URL結合エラー: %s + %s: %s", base_url, src, e)
                     continue
                 
-                download_images = self._get_config('output.download_images', True)
-                
                 if download_images:
                     # 画像をダウンロード
                     local_path = self._download_image(absolute_url)
                     if local_path:
                         img['src'] = local_path
-                        self.stats['images_downloaded'] += 1
+                        self._count('images_downloaded')
                     else:
                         # ダウンロード失敗時は絶対URLを設定
                         img['src'] = absolute_url
-                        self.stats['images_failed'] += 1
+                        self._count('images_failed')
                 else:
                     # 絶対URLに変換
                     img['src'] = absolute_url
@@ -202,11 +315,11 @@ class MarkdownConverter:
     def _download_image(self, image_url: str) -> Optional[str]:
         """画像をダウンロード"""
         try:
-            self.logger.debug(f"画像ダウンロード中: {image_url}")
+            self.logger.debug("画像ダウンロード中: %s", image_url)
             
             # 画像URLの検証
             if not self._is_valid_image_url(image_url):
-                self.logger.debug(f"無効な画像URL: {image_url}")
+                self.logger.debug("無効な画像URL: %s", image_url)
                 return None
             
             response = self.session.get(image_url, timeout=15)
@@ -222,12 +335,8 @@ class MarkdownConverter:
             filename = self._generate_image_filename(image_url, content_type)
             
             # 保存先のパスを作成
-            output_config = self._get_config('output', {})
-            base_dir = output_config.get('base_dir', './output')
-            image_dir_name = output_config.get('image_dir_name', 'images')
-            
-            image_dir = Path(base_dir) / image_dir_name
-            image_dir.mkdir(parents=True, exist_ok=True)
+            image_dir = self._image_dir
+            self._ensure_dir(image_dir)
             
             image_path = image_dir / filename
             
@@ -242,7 +351,7 @@ class MarkdownConverter:
                 f.write(response.content)
             
             # 相対パスを返す
-            return f"./{image_dir_name}/{filename}"
+            return f"./{self._image_dir_name}/{filename}"
             
         except requests.exceptions.Timeout:
             self.logger.warning(f"画像ダウンロードタイムアウト: {image_url}")
@@ -348,23 +457,23 @@ class MarkdownConverter:
             # フォールバック
             return f"page_{abs(hash(url)) % 100000:05d}.md"
     
+    def output_path(self, url: str) -> Path:
+        """URLに対応するMarkdownファイルの保存先"""
+        return self._base_dir / self._url_to_file_path(url)
+    
     def _save_markdown(self, content: str, url: str) -> Optional[Path]:
         """Markdownファイルを保存"""
         try:
-            filename = self._url_to_file_path(url)
-            
-            output_config = self._get_config('output', {})
-            base_dir = output_config.get('base_dir', './output')
-            file_path = Path(base_dir) / filename
+            file_path = self.output_path(url)
             
             # ディレクトリを作成
-            file_path.parent.mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(file_path.parent)
             
             # ファイルを保存
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(content)
             
-            self.logger.debug(f"Markdownファイル保存: {file_path}")
+            self.logger.debug("Markdownファイル保存: %s", file_path)
             return file_path
             
         except PermissionError as e:
@@ -395,23 +504,51 @@ class MarkdownConverter:
             self.error_handler.handle_error(error)
             return None
     
+    @property
+    def dedup_enabled(self) -> bool:
+        """重複ページの検出が有効かどうか"""
+        return self._deduplicator is not None
+    
+    def find_duplicate(self, url: str, soup: BeautifulSoup) -> Optional[str]:
+        """メインコンテンツが既出のページと重複していればそのURLを返す（未検出のページは登録される）"""
+        if self._deduplicator is None:
+            return None
+        
+        content = soup.select_one(self._content_selector) or soup.body
+        if content is None:
+            return None
+        return self._deduplicator.check(url, content.get_text(' ', strip=True))
+    
     def process_page(self, url: str, html_content: str = None) -> Optional[Path]:
         """ページを処理してMarkdownに変換・保存"""
-        self.stats['total_processed'] += 1
+        return self._process(url, html_content=html_content)
+    
+    def process_page_from_soup(self, url: str, soup: BeautifulSoup) -> Optional[Path]:
+        """解析済みのページを処理してMarkdownに変換・保存
+        
+        soupは変換時に不要な要素が除去されるため、リンク抽出など他の処理は先に済ませておくこと。
+        """
+        return self._process(url, soup=soup)
+    
+    def _process(self, url: str, html_content: Optional[str] = None,
+                 soup: Optional[BeautifulSoup] = None) -> Optional[Path]:
+        """HTML文字列または解析済みのページをMarkdownに変換・保存"""
+        self._count('total_processed')
         
         try:
             self.logger.info(f"ページ処理開始: {url}")
             
-            # HTMLコンテンツが提供されていない場合は取得
-            if html_content is None:
+            # メインコンテンツを抽出
+            if soup is not None:
+                main_content = self._extract_content_from_soup(soup, url)
+            elif html_content is None:
                 self.logger.error("HTMLコンテンツが提供されていません")
-                self.stats['total_failed'] += 1
+                self._count('total_failed')
                 return None
-            
-            # メインコンテンツを抽出
-            main_content = self._extract_content(html_content, url)
+            else:
+                main_content = self._extract_content(html_content, url)
             if main_content is None:
-                self.stats['total_failed'] += 1
+                self._count('total_failed')
                 return None
             
             # 画像を処理
@@ -419,31 +556,38 @@ class MarkdownConverter:
             
             # Markdownに変換
             try:
-                markdown_content = self.html2text.handle(processed_content)
+                markdown_content = self._get_html2text().handle(processed_content)
             except Exception as e:
                 self.logger.error(f"Markdown変換エラー: {url} - {e}")
-                self.stats['total_failed'] += 1
+                self._count('total_failed')
                 return None
             
             # ファイルに保存
             file_path = self._save_markdown(markdown_content, url)
             if file_path is None:
-                self.stats['total_failed'] += 1
+                self._count('total_failed')
                 return None
             
-            self.stats['total_success'] += 1
+            self._count('total_success')
             self.logger.info(f"ページ処理完了: {url} -> {file_path}")
             return file_path
             
         except Exception as e:
             self.logger.error(f"ページ処理中の予期しないエラー: {url} - {e}")
-            self.stats['total_failed'] += 1
+            self._count('total_failed')
             return None
     
     def get_stats(self) -> Dict[str, int]:
         """統計情報を取得"""
         return self.stats.copy()
     
+    def merge_stats(self, stats: Dict[str, int], error_stats: Dict[ErrorType, int]):
+        """別プロセスの変換ワーカーで集計した統計を加算"""
+        with self._stats_lock:
+            for key, count in stats.items():
+                self.stats[key] += count
+        self.error_handler.merge_error_stats(error_stats)
+    
     def log_summary(self):
         """処理結果のサマリーをログ出力"""
         self.logger.info("=== Markdown変換完了 ===")
@@ -458,4 +602,30 @@ class MarkdownConverter:
             self.logger.info(f"成功率: {success_rate:.1f}%")
         
         # エラー統計サマリーを出力
-        self.error_handler.log_error_summary()
\ No newline at end of file
+        self.error_handler.log_error_summary()
+
+
+# 変換ワーカープロセス内で使い回すコンバーター
+_worker_converter: Optional[MarkdownConverter] = None
+
+
+def init_worker_converter(config: Dict[str, Any]):
+    """変換ワーカープロセスの初期化（ProcessPoolExecutorのinitializer）"""
+    global _worker_converter
+    _worker_converter = MarkdownConverter(config)
+
+
+def process_page_in_worker(url: str, html_content: str) -> Tuple[Optional[Path], Dict[str, int], Dict[ErrorType, int]]:
+    """変換ワーカープロセスでページを変換・保存し、結果とこの呼び出し分の統計を返す"""
+    converter = _worker_converter
+    stats_before = converter.get_stats()
+    errors_before = converter.error_handler.get_error_summary()
+    
+    file_path = converter.process_page(url, html_content)
+    
+    stats = {key: count - stats_before[key] for key, count in converter.get_stats().items()}
+    error_stats = {
+        error_type: count - errors_before[error_type]
+        for error_type, count in converter.error_handler.get_error_summary().items()
+    }
+    return file_path, stats, error_stats
@@ -2,17 +2,31 @@
 Webクローリングとリンク発見機能
 """
 
+import io
+import json
 import requests
 import re
 import time
 import logging
-from urllib.parse import urljoin, urlparse, urlunparse
+import sqlite3
+import threading
+from urllib.parse import urljoin, urlparse, urlunparse, ParseResult
+from requests.compat import chardet
 from bs4 import BeautifulSoup
+import soupsieve
+from lxml import etree
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import heapq
-from typing import Set, List, Dict, Optional, Tuple
+from typing import Set, List, Dict, Optional, Tuple, Iterable, Iterator
 from error_types import ErrorHandler, NetworkError, ErrorSeverity
 
+try:
+    import ahocorasick  # 任意依存: pyahocorasick
+except ImportError:
+    ahocorasick = None
+
 
 class URLPriorityQueue:
     """優先度付きURLキュー"""
@@ -42,7 +56,306 @@ class URLPriorityQueue:
         return len(self._queue)
 
 
+class InMemoryURLStore(dict):
+    """訪問済みURLの記録（正規化URL -> 元URL）をメモリ上に保持するストア
+    
+    state_dbを指定しない場合に使う。VisitedURLStoreと同じインターフェースを持ち、
+    参照は通常の辞書と同じコストで済む。
+    """
+    
+    def __init__(self):
+        super().__init__()
+        # 取得スレッドからも追加されるため、確認と登録をまとめて行う
+        self._lock = threading.Lock()
+    
+    def add(self, normalized_url: str, url: str) -> bool:
+        """未登録の場合のみ追加し、追加されたかどうかを返す"""
+        with self._lock:
+            if normalized_url in self:
+                return False
+            self[normalized_url] = url
+        return True
+    
+    def commit(self):
+        """メモリ上の記録のため何もしない"""
+    
+    def close(self):
+        """メモリ上の記録のため何もしない"""
+
+
+class VisitedURLStore:
+    """訪問済みURLの記録（正規化URL -> 元URL）
+    
+    SQLiteをバックエンドとするdict互換のストア。state_dbにファイルパスを
+    指定した場合に使い、訪問済みURL（url_set('visited')）とキュー投入済みURL
+    （url_set('scheduled')）も同じデータベースに保持するため、クロール規模に
+    比例してプロセスのメモリが増えることはない。その代わり参照のたびにSQLiteへの
+    問い合わせが発生する。
+    リンク抽出スレッドからも参照されるため、接続へのアクセスはロックで直列化する。
+    """
+    
+    COMMIT_BATCH_SIZE = 100
+    
+    def __init__(self, db_path: str = ':memory:'):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=OFF')
+        self._db.execute('CREATE TABLE IF NOT EXISTS seen(n TEXT PRIMARY KEY, url TEXT NOT NULL)')
+        self._pending = 0
+    
+    def add(self, normalized_url: str, url: str) -> bool:
+        """未登録の場合のみ追加し、追加されたかどうかを返す"""
+        with self._lock:
+            cursor = self._db.execute('INSERT OR IGNORE INTO seen VALUES(?, ?)', (normalized_url, url))
+            if cursor.rowcount == 0:
+                return False
+            self._mark_dirty()
+        return True
+    
+    def update(self, items: Iterable[Tuple[str, str]]):
+        """(正規化URL, 元URL)の組をまとめて登録し、1回のトランザクションで確定"""
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO seen VALUES(?, ?)', items)
+            self._db.commit()
+            self._pending = 0
+    
+    def _mark_dirty(self):
+        """書き込み件数を数え、一定件数ごとにコミット（ロック取得済みで呼ぶ）"""
+        self._pending += 1
+        if self._pending >= self.COMMIT_BATCH_SIZE:
+            self._db.commit()
+            self._pending = 0
+    
+    def commit(self):
+        """未コミットの書き込みを確定"""
+        with self._lock:
+            if self._pending:
+                self._db.commit()
+                self._pending = 0
+    
+    def url_set(self, name: str) -> 'StoredURLSet':
+        """同じデータベースに保持するURL集合を返す"""
+        return StoredURLSet(self, name)
+    
+    def clear(self):
+        """全ての記録を削除"""
+        with self._lock:
+            self._db.execute('DELETE FROM seen')
+            self._db.commit()
+            self._pending = 0
+    
+    def close(self):
+        """コミットして接続を閉じる"""
+        self.commit()
+        with self._lock:
+            self._db.close()
+    
+    def __contains__(self, normalized_url: str) -> bool:
+        with self._lock:
+            cursor = self._db.execute('SELECT 1 FROM seen WHERE n = ?', (normalized_url,))
+            return cursor.fetchone() is not None
+    
+    def __getitem__(self, normalized_url: str) -> str:
+        with self._lock:
+            row = self._db.execute('SELECT url FROM seen WHERE n = ?', (normalized_url,)).fetchone()
+        if row is None:
+            raise KeyError(normalized_url)
+        return row[0]
+    
+    def __setitem__(self, normalized_url: str, url: str):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO seen VALUES(?, ?)', (normalized_url, url))
+            self._mark_dirty()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+    
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._db.execute('SELECT n FROM seen').fetchall()
+        return (row[0] for row in rows)
+    
+    def items(self) -> Iterator[Tuple[str, str]]:
+        with self._lock:
+            return iter(self._db.execute('SELECT n, url FROM seen').fetchall())
+
+
+class StoredURLSet:
+    """VisitedURLStoreのデータベースに保持するset互換のURL集合
+    
+    接続とロックはVisitedURLStoreと共有し、コミットもまとめて行う。
+    件数は保存のたびに参照されるため、メモリ上で数えておく。
+    """
+    
+    def __init__(self, store: VisitedURLStore, name: str):
+        self._store = store
+        self._insert_sql = f'INSERT OR IGNORE INTO {name} VALUES(?)'
+        self._select_sql = f'SELECT 1 FROM {name} WHERE url = ?'
+        self._all_sql = f'SELECT url FROM {name}'
+        self._delete_sql = f'DELETE FROM {name}'
+        with store._lock:
+            store._db.execute(f'CREATE TABLE IF NOT EXISTS {name}(url TEXT PRIMARY KEY)')
+            self._count = store._db.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+    
+    def add(self, url: str):
+        store = self._store
+        with store._lock:
+            if store._db.execute(self._insert_sql, (url,)).rowcount:
+                self._count += 1
+                store._mark_dirty()
+    
+    def update(self, urls: Iterable[str]):
+        """まとめて登録し、1回のトランザクションで確定"""
+        store = self._store
+        with store._lock:
+            before = store._db.total_changes
+            store._db.executemany(self._insert_sql, ((url,) for url in urls))
+            self._count += store._db.total_changes - before
+            store._db.commit()
+            store._pending = 0
+    
+    def clear(self):
+        store = self._store
+        with store._lock:
+            store._db.execute(self._delete_sql)
+            store._db.commit()
+            store._pending = 0
+            self._count = 0
+    
+    def copy(self) -> Set[str]:
+        """メモリ上のsetとして複製"""
+        return set(self)
+    
+    def __contains__(self, url: str) -> bool:
+        store = self._store
+        with store._lock:
+            return store._db.execute(self._select_sql, (url,)).fetchone() is not None
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __iter__(self) -> Iterator[str]:
+        store = self._store
+        with store._lock:
+            rows = store._db.execute(self._all_sql).fetchall()
+        return (row[0] for row in rows)
+
+
+# ページが前回の取得から変更されていない（304 Not Modified）ことを示すfetch_pageの戻り値
+NOT_MODIFIED = object()
+# Content-Typeやサイズ上限により取得対象外としたことを示すfetch_pageの戻り値（失敗ではない）
+SKIPPED = object()
+
+
+class PageCacheStore:
+    """再クロール用のページ情報（URL -> ETag, Last-Modified, 抽出したリンク）
+    
+    SQLiteに保存して実行をまたいで保持し、次回の取得時に条件付きリクエストを送るために使う。
+    複数の取得・変換スレッドから参照されるため、接続へのアクセスはロックで直列化する。
+    """
+    
+    def __init__(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS pages('
+            'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, links TEXT NOT NULL)'
+        )
+    
+    def get_validators(self, url: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """保存済みの(ETag, Last-Modified)を返す（未保存ならNone）"""
+        with self._lock:
+            return self._db.execute(
+                'SELECT etag, last_modified FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+    
+    def get_links(self, url: str) -> List[Tuple[str, int]]:
+        """前回抽出したリンクを返す"""
+        with self._lock:
+            row = self._db.execute('SELECT links FROM pages WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return []
+        return [(link_url, priority) for link_url, priority in json.loads(row[0])]
+    
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str],
+            links: List[Tuple[str, int]]):
+        """ページ情報を保存"""
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages VALUES(?, ?, ?, ?)',
+                (url, etag, last_modified, json.dumps(links))
+            )
+            self._db.commit()
+    
+    def close(self):
+        """接続を閉じる"""
+        with self._lock:
+            self._db.close()
+
+
+class HostRateLimiter:
+    """ホスト単位のリクエスト制御（トークンバケット）
+    
+    ホストごとにdelay秒で1つ補充される容量burstのバケットとして振る舞い、
+    burst件までは待たずに送信し、それ以降はリクエスト開始時刻が平均してdelay秒空くように待機させる。
+    同一ホストへの同時リクエスト数はmax_concurrentまでに制限する。
+    異なるホストへのリクエストは互いに待たされない。複数スレッドから呼び出し可能。
+    """
+    
+    def __init__(self, delay: float, max_concurrent: int = 1, burst: int = 1):
+        self.delay = delay
+        self.max_concurrent = max_concurrent
+        self.burst = burst
+        # バケットが満杯の状態から先取りできる時間
+        self._burst_allowance = (burst - 1) * delay
+        self._next_slot: Dict[str, float] = {}  # ホスト -> バケットが空になる理論上の時刻
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+    
+    def wait(self, url: str):
+        """urlのホストに対して送信可能になるまで待機"""
+        if self.delay <= 0:
+            return
+        
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            next_slot = max(now, self._next_slot.get(host, now))
+            slot = max(now, next_slot - self._burst_allowance)
+            self._next_slot[host] = next_slot + self.delay
+        
+        if slot > now:
+            time.sleep(slot - now)
+    
+    @contextmanager
+    def acquire(self, url: str):
+        """同時リクエスト数の枠を確保し、送信可能になるまで待機してから処理させる"""
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.Semaphore(self.max_concurrent)
+                self._semaphores[host] = semaphore
+        
+        with semaphore:
+            self.wait(url)
+            yield
+
+
 class WebCrawler:
+    # 本文を取得する対象のContent-Type
+    HTML_CONTENT_TYPES = ('text/html', 'application/xhtml')
+    
+    # 本文を読み込む単位（バイト）
+    READ_CHUNK_SIZE = 64 * 1024
+    
+    # リンクテキストによる優先度調整のキーワード
+    HIGH_PRIORITY_KEYWORDS = ('index', 'overview', 'introduction', 'getting-started')
+    LOW_PRIORITY_KEYWORDS = ('appendix', 'reference', 'changelog', 'history')
+    
     def __init__(self, config):
         self.config = config
         self._setup_session()
@@ -52,9 +365,19 @@ class WebCrawler:
         self.error_handler = ErrorHandler(self.logger)
         
         # URL管理
-        self.visited_urls: Set[str] = set()
-        self.normalized_urls: Dict[str, str] = {}  # 正規化URL -> 元URL
+        # state_dbを指定した場合は訪問記録をすべてSQLiteに保持する
+        state_db = config.get('crawler', {}).get('state_db', ':memory:')
+        self._stored_state = state_db != ':memory:'
         self.url_queue = URLPriorityQueue()
+        if self._stored_state:
+            self.normalized_urls = VisitedURLStore(state_db)  # 正規化URL -> 元URL
+            self.visited_urls = self.normalized_urls.url_set('visited')
+            # キューに投入済みの正規化URL（同じページへのリンクはクエリやフラグメントが違っても一度だけ投入する）
+            self._scheduled = self.normalized_urls.url_set('scheduled')
+        else:
+            self.normalized_urls = InMemoryURLStore()
+            self.visited_urls = set()
+            self._scheduled = set()
         
         # 統計情報
         self.stats = {
@@ -66,7 +389,85 @@ class WebCrawler:
         # リトライとスキップ管理
         self.retry_config = config.get('retry', {})
         self.failed_url_counts = {}  # URL -> 失敗回数のマップ
+        self._auto_skipped = 0  # 失敗回数が自動スキップの閾値に達したURL数
+        
+        # 条件付きリクエスト用のページ情報（page_cache_db指定時のみ）
+        page_cache_db = config.get('crawler', {}).get('page_cache_db')
+        self.page_cache = PageCacheStore(page_cache_db) if page_cache_db else None
+        # 取得したが変換結果の確定前のページの(ETag, Last-Modified)
+        self._pending_validators: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        
+        # ホストごとの推定エンコーディング（charset未指定時の推定を1回に抑える）
+        self._encoding_cache: Dict[str, str] = {}
+        
+        # fetch_pageは複数スレッドから呼ばれるため、統計の更新はロックで保護する
+        self._stats_lock = threading.Lock()
+        
+        self._freeze_config()
+        
+        # リクエスト間隔と同時リクエスト数はホスト単位で制御する
+        self.rate_limiter = HostRateLimiter(
+            self._request_delay, self._per_host_concurrency, self._request_burst
+        )
+    
+    def _freeze_config(self):
+        """ホットパスで参照する設定値を一度だけ解決してインスタンス属性に保持"""
+        target_config = self.config.get('target_site', {})
+        crawler_config = self.config.get('crawler', {})
+        execution_config = self.config.get('execution', {})
+        
+        self._start_url = target_config.get('start_url', '')
+        self._allowed_domain = target_config.get('allowed_domain', '')
+        self._nav_selector = crawler_config.get('navigation_selector', 'nav')
+        self._max_page_bytes = crawler_config.get('max_page_bytes', 10 * 1024 * 1024)
+        self._per_host_concurrency = crawler_config.get('per_host_concurrency', 2)
+        self._request_delay = execution_config.get('request_delay', 1.0)
+        self._request_burst = execution_config.get('request_burst', 1)
+        
+        # 除外パターンは事前にコンパイル（無効なパターンは警告して除外）
+        self._exclude_patterns = []
+        for pattern in crawler_config.get('exclude_patterns', []):
+            try:
+                self._exclude_patterns.append(re.compile(pattern))
+            except re.error as e:
+                self.logger.warning(f"無効な正規表現パターン '{pattern}': {e}")
+        
+        # ナビゲーションセレクターは事前にコンパイル（無効なセレクターはリンク抽出を行わない）
+        try:
+            self._nav_css = soupsieve.compile(self._nav_selector)
+        except soupsieve.SelectorSyntaxError as e:
+            self.logger.error(f"無効なナビゲーションセレクター '{self._nav_selector}': {e}")
+            self._nav_css = None
         
+        # キーワードは小文字化済みの集合として保持
+        self._high_pri_kw = frozenset(keyword.lower() for keyword in self.HIGH_PRIORITY_KEYWORDS)
+        self._low_pri_kw = frozenset(keyword.lower() for keyword in self.LOW_PRIORITY_KEYWORDS)
+        self._keyword_automaton = self._build_keyword_automaton()
+        
+        # リトライ設定
+        self._max_retries = self.retry_config.get('max_retries', 3)
+        self._initial_delay = self.retry_config.get('initial_delay', 1.0)
+        self._backoff_factor = self.retry_config.get('backoff_factor', 2)
+        self._max_delay = self.retry_config.get('max_delay', 60.0)
+        self._skip_after_failures = self.retry_config.get('skip_after_failures', 5)
+        self._retry_status_codes = frozenset(
+            self.retry_config.get('retry_status_codes', [429, 500, 502, 503, 504])
+        )
+    
+    def _build_keyword_automaton(self):
+        """優先度キーワードのAho-Corasickオートマトンを構築（pyahocorasick未導入時はNone）"""
+        if ahocorasick is None:
+            return None
+        
+        automaton = ahocorasick.Automaton()
+        for keyword in self._low_pri_kw:
+            automaton.add_word(keyword, '-')
+        # 両方に含まれるキーワードは高優先度として扱う
+        for keyword in self._high_pri_kw:
+            automaton.add_word(keyword, '+')
+        automaton.make_automaton()
+        return automaton
+    
     def _setup_session(self):
         """HTTPセッションの設定"""
         self.session = requests.Session()
@@ -86,16 +487,18 @@ class WebCrawler:
             'Upgrade-Insecure-Requests': '1',
         })
         
-        # リトライ設定
+        # リトライは _fetch_page 側の設定可能なバックオフで一元的に行う。
+        # アダプター側でもリトライすると待機が多重になり、失敗の集計もずれるため無効化する
         from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
         
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+        # アダプターはここで一度だけマウントし、セッションを使い回してkeep-alive接続を再利用する。
+        # 並行取得するワーカー数に合わせてホストごとの接続プールを確保する
+        concurrency = self.config.get('crawler', {}).get('concurrency', 1)
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=max(concurrency, 20),
+            max_retries=0,
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
     
@@ -111,10 +514,11 @@ class WebCrawler:
             self.logger.addHandler(handler)
             self.logger.setLevel(logging.INFO)
     
-    def _normalize_url(self, url: str) -> str:
+    def _normalize_url(self, url: str, parsed: Optional[ParseResult] = None) -> str:
         """URLを正規化（重複検出用）"""
         try:
-            parsed = urlparse(url)
+            if parsed is None:
+                parsed = urlparse(url)
             
             # クエリパラメータとフラグメントを除去
             normalized = urlunparse((
@@ -130,49 +534,66 @@ class WebCrawler:
         except Exception:
             return url.lower()
     
-    def _is_valid_url(self, url: str) -> Tuple[bool, str]:
+    def _is_valid_url(self, url: str, parsed: Optional[ParseResult] = None) -> Tuple[bool, str]:
         """URLが有効かどうかをチェック"""
         if not url:
             return False, "空のURL"
         
         # URL正規化
-        normalized_url = self._normalize_url(url)
+        normalized_url = self._normalize_url(url, parsed)
         
         # 重複チェック
         if normalized_url in self.normalized_urls:
             return False, "重複URL"
         
         # 許可されたドメインのチェック
-        target_config = self.config.get('target_site', {})
-        allowed_domain = target_config.get('allowed_domain', '')
-        
+        allowed_domain = self._allowed_domain
         if allowed_domain and not url.startswith(allowed_domain):
             return False, f"許可されていないドメイン: {allowed_domain}"
         
         # 除外パターンのチェック
-        crawler_config = self.config.get('crawler', {})
-        exclude_patterns = crawler_config.get('exclude_patterns', [])
-        
-        for pattern in exclude_patterns:
-            try:
-                if re.search(pattern, url):
-                    return False, f"除外パターンに一致: {pattern}"
-            except re.error as e:
-                self.logger.warning(f"無効な正規表現パターン '{pattern}': {e}")
-                continue
+        for pattern in self._exclude_patterns:
+            if pattern.search(url):
+                return False, f"除外パターンに一致: {pattern.pattern}"
         
         return True, "有効"
     
     def _extract_links(self, url: str, html_content: str) -> List[Tuple[str, int]]:
         """HTMLからリンクを抽出（優先度付き）"""
+        nav_selector = self._nav_selector
+        
+        # 単純なタグ名セレクターはDOM全体を構築せずにストリーム解析
+        if nav_selector.isalpha():
+            try:
+                return self._extract_links_streaming(url, html_content, nav_selector.lower())
+            except etree.LxmlError as e:
+                self.logger.debug("ストリーム解析に失敗したためDOM解析に切り替え: %s: %s", url, e)
+            except Exception as e:
+                self.logger.error(f"リンク抽出エラー {url}: {e}")
+                return []
+        
+        if self._nav_css is None:
+            return []
+        
         try:
             soup = BeautifulSoup(html_content, 'lxml')
+        except Exception as e:
+            self.logger.error(f"リンク抽出エラー {url}: {e}")
+            return []
+        
+        return self._extract_links_from_soup(url, soup)
+    
+    def _extract_links_from_soup(self, url: str, soup: BeautifulSoup) -> List[Tuple[str, int]]:
+        """解析済みのページからリンクを抽出（優先度付き）"""
+        nav_selector = self._nav_selector
+        if self._nav_css is None:
+            return []
+        
+        try:
             links = []
             
             # ナビゲーションセレクターで指定された要素内のリンクを取得
-            crawler_config = self.config.get('crawler', {})
-            nav_selector = crawler_config.get('navigation_selector', 'nav')
-            nav_elements = soup.select(nav_selector)
+            nav_elements = self._nav_css.select(soup)
             
             if not nav_elements:
                 self.logger.warning(f"ナビゲーション要素が見つかりません: {nav_selector}")
@@ -184,21 +605,8 @@ class WebCrawler:
                     if not href:
                         continue
                     
-                    # 相対URLを絶対URLに変換
-                    try:
-                        absolute_url = urljoin(url, href)
-                    except Exception as e:
-                        self.logger.warning(f"URL結合エラー: {url} + {href}: {e}")
-                        continue
-                    
-                    # URL検証
-                    is_valid, reason = self._is_valid_url(absolute_url)
-                    if is_valid:
-                        # 優先度を決定（深さベースの簡単な優先度）
-                        priority = self._calculate_priority(absolute_url, link)
-                        links.append((absolute_url, priority))
-                    else:
-                        self.logger.debug(f"スキップ: {absolute_url} - {reason}")
+                    link_text = link.get_text(strip=True).lower()
+                    self._append_link(links, url, href, link_text)
             
             return links
             
@@ -206,70 +614,245 @@ class WebCrawler:
             self.logger.error(f"リンク抽出エラー {url}: {e}")
             return []
     
-    def _calculate_priority(self, url: str, link_element) -> int:
+    def _extract_links_streaming(self, url: str, html_content: str, nav_tag: str) -> List[Tuple[str, int]]:
+        """ナビゲーション要素をストリーム解析してリンクを抽出
+        
+        解析済みの要素は終了タグの時点で破棄するため、
+        メモリ使用量はページ全体ではなくナビゲーション部分木の大きさに抑えられる。
+        """
+        links = []
+        nav_found = False
+        in_nav_depth = 0
+        in_anchor_depth = 0
+        
+        source = io.BytesIO(html_content.encode('utf-8'))
+        for event, elem in etree.iterparse(source, events=('start', 'end'), html=True, encoding='utf-8'):
+            tag = elem.tag
+            if not isinstance(tag, str):
+                continue
+            
+            if event == 'start':
+                if tag == nav_tag:
+                    in_nav_depth += 1
+                    nav_found = True
+                elif tag == 'a' and in_nav_depth > 0:
+                    in_anchor_depth += 1
+                continue
+            
+            if tag == 'a' and in_anchor_depth > 0:
+                in_anchor_depth -= 1
+                href = (elem.get('href') or '').strip()
+                if href:
+                    # BeautifulSoupのget_text(strip=True)と同じ結合規則
+                    link_text = ''.join(text.strip() for text in elem.itertext()).lower()
+                    self._append_link(links, url, href, link_text)
+            elif tag == nav_tag and in_nav_depth > 0:
+                in_nav_depth -= 1
+            
+            # リンクテキストの取得が終わった要素は即座に解放
+            if in_anchor_depth == 0:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+        
+        if not nav_found:
+            self.logger.warning(f"ナビゲーション要素が見つかりません: {nav_tag}")
+        
+        return links
+    
+    def _append_link(self, links: List[Tuple[str, int]], url: str, href: str, link_text: str):
+        """hrefを検証し、有効であれば優先度付きでリストに追加"""
+        # 相対URLを絶対URLに変換
+        try:
+            absolute_url = urljoin(url, href)
+        except Exception as e:
+            self.logger.warning("URL結合エラー: %s + %s: %s", url, href, e)
+            return
+        
+        # URL検証（解析結果は正規化と優先度計算で共有）
+        parsed = urlparse(absolute_url)
+        is_valid, reason = self._is_valid_url(absolute_url, parsed)
+        if is_valid:
+            # 優先度を決定（深さベースの簡単な優先度）
+            priority = self._calculate_priority(parsed.path, link_text)
+            links.append((absolute_url, priority))
+        elif self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("スキップ: %s - %s", absolute_url, reason)
+    
+    def _calculate_priority(self, parsed_path: str, link_text: str) -> int:
         """リンクの優先度を計算"""
         priority = 10  # デフォルト優先度
         
         # パスの深さで優先度を調整（浅いほど高優先度）
-        path_depth = url.count('/') - 3  # http://example.com/ = 3
+        path_depth = parsed_path.count('/') - 1  # "/" = 0
         priority += path_depth
         
         # リンクテキストで優先度を調整
-        link_text = link_element.get_text(strip=True).lower()
-        high_priority_keywords = ['index', 'overview', 'introduction', 'getting-started']
-        low_priority_keywords = ['appendix', 'reference', 'changelog', 'history']
-        
-        if any(keyword in link_text for keyword in high_priority_keywords):
-            priority -= 5  # 高優先度
-        elif any(keyword in link_text for keyword in low_priority_keywords):
-            priority += 5  # 低優先度
+        priority += self._keyword_priority_adjustment(link_text)
         
         return max(0, priority)
     
+    def _keyword_priority_adjustment(self, link_text: str) -> int:
+        """リンクテキストに含まれるキーワードによる優先度の補正値"""
+        if self._keyword_automaton is not None:
+            # テキストを一度走査するだけで全キーワードを照合
+            low_matched = False
+            for _, tag in self._keyword_automaton.iter(link_text):
+                if tag == '+':
+                    return -5  # 高優先度
+                low_matched = True
+            return 5 if low_matched else 0
+        
+        if any(keyword in link_text for keyword in self._high_pri_kw):
+            return -5  # 高優先度
+        if any(keyword in link_text for keyword in self._low_pri_kw):
+            return 5  # 低優先度
+        return 0
+    
     def _calculate_backoff_delay(self, retry_count: int) -> float:
         """設定可能な指数バックオフ遅延を計算"""
-        initial_delay = self.retry_config.get('initial_delay', 1.0)
-        backoff_factor = self.retry_config.get('backoff_factor', 2)
-        max_delay = self.retry_config.get('max_delay', 60.0)
-        
-        delay = initial_delay * (backoff_factor ** retry_count)
-        return min(delay, max_delay)
+        delay = self._initial_delay * (self._backoff_factor ** retry_count)
+        return min(delay, self._max_delay)
     
     def _should_skip_url(self, url: str) -> bool:
         """URLを自動スキップすべきかどうかを判定"""
-        skip_after_failures = self.retry_config.get('skip_after_failures', 5)
         failed_count = self.failed_url_counts.get(url, 0)
-        return failed_count >= skip_after_failures
+        return failed_count >= self._skip_after_failures
     
     def _increment_failure_count(self, url: str):
         """URL失敗カウントを増加"""
-        self.failed_url_counts[url] = self.failed_url_counts.get(url, 0) + 1
+        with self._stats_lock:
+            count = self.failed_url_counts.get(url, 0) + 1
+            self.failed_url_counts[url] = count
+            # 閾値に達した時点で自動スキップ数を数える（集計時の走査を不要にする）
+            if count == self._skip_after_failures:
+                self._auto_skipped += 1
     
     def _should_retry_status_code(self, status_code: int) -> bool:
         """HTTPステータスコードがリトライ対象かどうかを判定"""
-        retry_status_codes = self.retry_config.get('retry_status_codes', [429, 500, 502, 503, 504])
-        return status_code in retry_status_codes
+        return status_code in self._retry_status_codes
+    
+    def _should_fetch(self, url: str, response: requests.Response) -> bool:
+        """レスポンスヘッダーを確認し、本文をダウンロードすべきかどうかを判定"""
+        content_type = response.headers.get('content-type', '').lower()
+        if content_type and not content_type.startswith(self.HTML_CONTENT_TYPES):
+            self.logger.info(f"HTML以外のコンテンツをスキップ: {url} ({content_type})")
+            return False
+        
+        content_length = response.headers.get('content-length', '')
+        if content_length.isdigit() and int(content_length) > self._max_page_bytes:
+            self.logger.warning(f"ページサイズが上限を超えているためスキップ: {url} ({content_length} bytes)")
+            return False
+        
+        return True
+    
+    def _read_body(self, url: str, response: requests.Response) -> Optional[bytes]:
+        """本文をチャンク単位で読み込む（max_page_bytesを超えた時点で打ち切りNoneを返す）
+        
+        Content-Lengthのないチャンク転送のレスポンスでも、上限を超える本文を全てダウンロードしない。
+        """
+        max_bytes = self._max_page_bytes
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=self.READ_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                self.logger.warning(f"ページサイズが上限を超えているためスキップ: {url} ({size}+ bytes)")
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+    
+    def _conditional_headers(self, url: str) -> Optional[Dict[str, str]]:
+        """保存済みのETag/Last-Modifiedから条件付きリクエストのヘッダーを作成"""
+        if self.page_cache is None:
+            return None
+        validators = self.page_cache.get_validators(url)
+        if validators is None:
+            return None
+        
+        etag, last_modified = validators
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers or None
     
-    def _fetch_page(self, url: str, retry_count: int = 0) -> Optional[str]:
-        """ページを取得（強化されたリトライとスキップ機能付き）"""
+    def _remember_validators(self, url: str, response: requests.Response):
+        """レスポンスのETag/Last-Modifiedを、変換結果が確定するまで保持"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._stats_lock:
+            if etag or last_modified:
+                self._pending_validators[url] = (etag, last_modified)
+            else:
+                self._pending_validators.pop(url, None)
+    
+    def _fetch_page(self, url: str, retry_count: int = 0, conditional: bool = False):
+        """ページを取得（強化されたリトライとスキップ機能付き）
+        
+        conditionalが真で前回のETag/Last-Modifiedが保存されていれば条件付きリクエストを送り、
+        ページが変更されていなければNOT_MODIFIEDを返す。
+        HTML以外やサイズ上限を超えるページは取得対象外としてSKIPPEDを返す。
+        """
         # スキップ判定
         if self._should_skip_url(url):
             self.logger.warning(f"自動スキップ: {url} (失敗回数: {self.failed_url_counts[url]})")
+            if retry_count > 0:
+                # リトライ途中での打ち切りも最終的な失敗として数える
+                with self._stats_lock:
+                    self.stats['total_failed'] += 1
             return None
         
-        max_retries = self.retry_config.get('max_retries', 3)
+        max_retries = self._max_retries
         
         try:
             self.logger.info(f"ページ取得中: {url}")
             
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # エンコーディングの適切な設定
-            if response.encoding == 'ISO-8859-1' and 'charset' not in response.headers.get('content-type', ''):
-                response.encoding = response.apparent_encoding
+            # 同一ホストへの同時リクエスト数とリクエスト間隔を制御し、
+            # ヘッダーを確認してから本文を読み込むためストリーミングで取得
+            headers = self._conditional_headers(url) if conditional else None
             
-            return response.text
+            with self.rate_limiter.acquire(url):
+                with self.session.get(url, headers=headers, timeout=30, stream=True) as response:
+                    if response.status_code == 304 and headers:
+                        return NOT_MODIFIED
+                    response.raise_for_status()
+                    
+                    if not self._should_fetch(url, response):
+                        # 対象外のURLを再度キューに積まないよう記録しておく
+                        self.normalized_urls.add(self._normalize_url(url), url)
+                        with self._stats_lock:
+                            self.stats['total_skipped'] += 1
+                        return SKIPPED
+                    
+                    body = self._read_body(url, response)
+                    if body is None:
+                        self.normalized_urls.add(self._normalize_url(url), url)
+                        with self._stats_lock:
+                            self.stats['total_skipped'] += 1
+                        return SKIPPED
+                    
+                    if self.page_cache is not None:
+                        self._remember_validators(url, response)
+                    
+                    # エンコーディングの適切な設定（推定結果はホスト単位で再利用）
+                    encoding = response.encoding
+                    if encoding is None or (
+                            encoding == 'ISO-8859-1'
+                            and 'charset' not in response.headers.get('content-type', '')):
+                        netloc = urlparse(url).netloc
+                        encoding = self._encoding_cache.get(netloc)
+                        if encoding is None:
+                            encoding = chardet.detect(body)['encoding']
+                            if encoding:
+                                self._encoding_cache[netloc] = encoding
+                    
+                    # Response.textと同じく不正なバイト列は置換してデコード
+                    try:
+                        return str(body, encoding or 'utf-8', errors='replace')
+                    except LookupError:
+                        return str(body, 'utf-8', errors='replace')
             
         except requests.exceptions.Timeout as e:
             error = NetworkError(
@@ -278,19 +861,7 @@ class WebCrawler:
                 severity=ErrorSeverity.MEDIUM,
                 original_exception=e
             )
-            
-            self.error_handler.handle_error(error)
-            self._increment_failure_count(url)
-            self.stats['total_failed'] += 1
-            
-            # リトライ判定
-            if retry_count < max_retries - 1 and self.error_handler.should_retry(error):
-                delay = self._calculate_backoff_delay(retry_count)
-                self.logger.debug(f"リトライ前に{delay:.1f}秒待機")
-                time.sleep(delay)
-                return self._fetch_page(url, retry_count + 1)
-            
-            return None
+            return self._handle_fetch_failure(url, error, retry_count, retry_count < max_retries - 1, conditional)
             
         except requests.exceptions.ConnectionError as e:
             error = NetworkError(
@@ -299,23 +870,12 @@ class WebCrawler:
                 severity=ErrorSeverity.MEDIUM,
                 original_exception=e
             )
-            
-            self.error_handler.handle_error(error)
-            self._increment_failure_count(url)
-            self.stats['total_failed'] += 1
-            
-            # リトライ判定
-            if retry_count < max_retries - 1 and self.error_handler.should_retry(error):
-                delay = self._calculate_backoff_delay(retry_count)
-                self.logger.debug(f"リトライ前に{delay:.1f}秒待機")
-                time.sleep(delay)
-                return self._fetch_page(url, retry_count + 1)
-            
-            return None
+            return self._handle_fetch_failure(url, error, retry_count, retry_count < max_retries - 1, conditional)
             
         except requests.exceptions.HTTPError as e:
             # HTTPステータスエラー（4xx, 5xxなど）
-            status_code = e.response.status_code if e.response else 0
+            # エラーレスポンスは偽と評価されるため None との比較で判定する
+            status_code = e.response.status_code if e.response is not None else 0
             
             # 設定可能なステータスコードベースのリトライ判定
             if self._should_retry_status_code(status_code):
@@ -331,18 +891,7 @@ class WebCrawler:
                 severity=severity,
                 original_exception=e
             )
-            
-            self.error_handler.handle_error(error)
-            self._increment_failure_count(url)
-            self.stats['total_failed'] += 1
-            
-            if should_retry and self.error_handler.should_retry(error):
-                delay = self._calculate_backoff_delay(retry_count)
-                self.logger.debug(f"リトライ前に{delay:.1f}秒待機")
-                time.sleep(delay)
-                return self._fetch_page(url, retry_count + 1)
-            
-            return None
+            return self._handle_fetch_failure(url, error, retry_count, should_retry, conditional)
             
         except requests.exceptions.RequestException as e:
             error = NetworkError(
@@ -351,19 +900,7 @@ class WebCrawler:
                 severity=ErrorSeverity.MEDIUM,
                 original_exception=e
             )
-            
-            self.error_handler.handle_error(error)
-            self._increment_failure_count(url)
-            self.stats['total_failed'] += 1
-            
-            # リトライ判定
-            if retry_count < max_retries - 1 and self.error_handler.should_retry(error):
-                delay = self._calculate_backoff_delay(retry_count)
-                self.logger.debug(f"リトライ前に{delay:.1f}秒待機")
-                time.sleep(delay)
-                return self._fetch_page(url, retry_count + 1)
-            
-            return None
+            return self._handle_fetch_failure(url, error, retry_count, retry_count < max_retries - 1, conditional)
             
         except Exception as e:
             error = NetworkError(
@@ -372,19 +909,29 @@ class WebCrawler:
                 severity=ErrorSeverity.HIGH,
                 original_exception=e
             )
-            
-            self.error_handler.handle_error(error)
-            self._increment_failure_count(url)
+            return self._handle_fetch_failure(url, error, retry_count, False, conditional)
+    
+    def _handle_fetch_failure(self, url: str, error: NetworkError,
+                              retry_count: int, can_retry: bool, conditional: bool = False):
+        """取得失敗を記録し、可能であればバックオフ後にリトライする"""
+        self.error_handler.handle_error(error)
+        self._increment_failure_count(url)
+        
+        # リトライ判定
+        if can_retry and self.error_handler.should_retry(error):
+            delay = self._calculate_backoff_delay(retry_count)
+            self.logger.debug("リトライ前に%.1f秒待機", delay)
+            time.sleep(delay)
+            return self._fetch_page(url, retry_count + 1, conditional)
+        
+        # 失敗数は試行ごとではなく最終的に諦めた時点でのみ数える
+        with self._stats_lock:
             self.stats['total_failed'] += 1
-            return None
+        return None
     
     def crawl(self) -> List[str]:
         """クロール実行"""
-        target_config = self.config.get('target_site', {})
-        execution_config = self.config.get('execution', {})
-        
-        start_url = target_config.get('start_url', '')
-        request_delay = execution_config.get('request_delay', 1.0)
+        start_url = self._start_url
         
         if not start_url:
             self.logger.error("start_urlが設定されていません")
@@ -396,50 +943,73 @@ class WebCrawler:
         self.url_queue.put(start_url, priority=0)
         crawled_urls = []
         
-        while not self.url_queue.empty():
-            current_url = self.url_queue.get()
-            
-            # 正規化URLで重複チェック
-            normalized_url = self._normalize_url(current_url)
-            if normalized_url in self.normalized_urls:
-                self.stats['total_skipped'] += 1
-                continue
-            
-            # ページを取得
-            html_content = self._fetch_page(current_url)
-            if html_content is None:
-                continue
-            
-            # 訪問済みとしてマーク
-            self.normalized_urls[normalized_url] = current_url
-            self.visited_urls.add(current_url)
-            crawled_urls.append(current_url)
-            self.stats['total_crawled'] += 1
-            
-            # 総数計算: 処理済み + 現在のキュー内URL数
-            total_count = self.stats['total_crawled'] + self.url_queue.size()
-            self.logger.info(f"[{self.stats['total_crawled']}/{total_count}] 処理中: ({current_url})")
-            
-            # リンクを抽出してキューに追加
-            links = self._extract_links(current_url, html_content)
-            added_count = 0
-            
-            for link_url, priority in links:
-                normalized_link = self._normalize_url(link_url)
-                if normalized_link not in self.normalized_urls:
-                    self.url_queue.put(link_url, priority)
-                    added_count += 1
-            
-            if added_count > 0:
-                self.logger.debug(f"新しいリンクを{added_count}個追加")
-            
-            # リクエスト間隔の調整
-            if request_delay > 0 and not self.url_queue.empty():
-                time.sleep(request_delay)
+        # リンク抽出（HTML解析）は別スレッドで行い、次ページの取得と並行させる。
+        # キューと訪問済みストアの操作はメインスレッドのみで行う
+        pending_links = None
+        
+        with ThreadPoolExecutor(max_workers=1) as parse_pool:
+            while True:
+                if self.url_queue.empty():
+                    if pending_links is None:
+                        break
+                    # キューが空の場合は抽出結果を待ってからURLを補充する
+                    self._enqueue_links(pending_links.result())
+                    pending_links = None
+                    continue
+                
+                current_url = self.url_queue.get()
+                
+                # 正規化URLで重複チェック
+                normalized_url = self._normalize_url(current_url)
+                if normalized_url in self.normalized_urls:
+                    self.stats['total_skipped'] += 1
+                    continue
+                
+                # ページを取得
+                html_content = self._fetch_page(current_url)
+                
+                # 前ページのリンク抽出は取得中に進んでいるので、ここで結果をキューに反映する
+                if pending_links is not None:
+                    self._enqueue_links(pending_links.result())
+                    pending_links = None
+                
+                if html_content is None or html_content is SKIPPED:
+                    continue
+                
+                # 訪問済みとしてマーク
+                self.normalized_urls.add(normalized_url, current_url)
+                self.visited_urls.add(current_url)
+                crawled_urls.append(current_url)
+                self.stats['total_crawled'] += 1
+                
+                # 総数計算: 処理済み + 現在のキュー内URL数
+                total_count = self.stats['total_crawled'] + self.url_queue.size()
+                self.logger.info(f"[{self.stats['total_crawled']}/{total_count}] 処理中: ({current_url})")
+                
+                # リンク抽出を投入し、結果は次ページの取得後に受け取る
+                pending_links = parse_pool.submit(self._extract_links, current_url, html_content)
         
+        self.normalized_urls.commit()
         self.log_crawl_summary(crawled_urls)
         return crawled_urls
     
+    def _enqueue_links(self, links: List[Tuple[str, int]]) -> int:
+        """抽出したリンクのうち未投入かつ未訪問のものをキューに追加し、追加件数を返す"""
+        scheduled = self._scheduled
+        added_count = 0
+        
+        for link_url, priority in links:
+            normalized_link = self._normalize_url(link_url)
+            if normalized_link in scheduled or normalized_link in self.normalized_urls:
+                continue
+            scheduled.add(normalized_link)
+            self.url_queue.put(link_url, priority)
+            added_count += 1
+        
+        if added_count > 0:
+            self.logger.debug("新しいリンクを%d個追加", added_count)
+        return added_count
+    
     def log_crawl_summary(self, crawled_urls: List[str]):
         """クロール結果のサマリーをログ出力"""
         stats = self.get_stats()
@@ -456,7 +1026,7 @@ class WebCrawler:
             self.logger.info("=== 失敗URL統計 ===")
             sorted_failures = sorted(self.failed_url_counts.items(), key=lambda x: x[1], reverse=True)
             for url, count in sorted_failures[:10]:  # 上位10件
-                status = "自動スキップ" if count >= self.retry_config.get('skip_after_failures', 5) else "失敗"
+                status = "自動スキップ" if count >= self._skip_after_failures else "失敗"
                 self.logger.info(f"  {status}: {url} ({count}回)")
         
         # エラー統計サマリーを出力
@@ -469,7 +1039,8 @@ class WebCrawler:
     
     def get_page_content(self, url: str) -> Optional[str]:
         """指定されたURLのページ内容を取得（converter用）"""
-        return self._fetch_page(url)
+        html_content = self._fetch_page(url)
+        return None if html_content is SKIPPED else html_content
     
     def normalize_url(self, url: str) -> str:
         """Public method to normalize URLs"""
@@ -479,28 +1050,80 @@ class WebCrawler:
         """Public method to extract links from HTML content"""
         return self._extract_links(url, html_content)
     
-    def mark_url_as_visited(self, url: str):
-        """Mark a URL as visited"""
+    def enqueue_links(self, links: List[Tuple[str, int]]) -> int:
+        """Public method to enqueue extracted links (returns number of links added)"""
+        return self._enqueue_links(links)
+    
+    def extract_links_from_soup(self, url: str, soup: BeautifulSoup) -> List[Tuple[str, int]]:
+        """Public method to extract links from an already parsed page"""
+        return self._extract_links_from_soup(url, soup)
+    
+    def mark_url_as_visited(self, url: str) -> bool:
+        """Mark a URL as visited (returns False if it was already visited)"""
         normalized = self._normalize_url(url)
-        if normalized not in self.normalized_urls:
-            self.normalized_urls[normalized] = url
-            self.visited_urls.add(url)
-            self.stats['total_crawled'] += 1
+        if not self.normalized_urls.add(normalized, url):
+            return False
+        self.visited_urls.add(url)
+        self.stats['total_crawled'] += 1
+        return True
+    
+    def restore_visited_state(self, visited_urls: Set[str], failed_url_counts: Dict[str, int]):
+        """リカバリ状態から訪問記録を復元
+        
+        メモリ上で記録する場合は渡したコレクションをコピーせずにそのまま引き継ぎ、
+        state_dbに記録する場合はデータベースへ登録する。
+        """
+        if self._stored_state:
+            self.visited_urls.update(visited_urls)
+        else:
+            self.visited_urls = visited_urls
+        self.failed_url_counts = failed_url_counts
+        self._auto_skipped = sum(1 for count in failed_url_counts.values()
+                                 if count >= self._skip_after_failures)
+        normalize = self._normalize_url
+        self.normalized_urls.update((normalize(url), url) for url in visited_urls)
+    
+    def reset_visited_state(self):
+        """訪問記録を初期化（永続化されたstate_dbも含む）"""
+        self.visited_urls.clear()
+        self.normalized_urls.clear()
+        self._scheduled.clear()
+    
+    def close(self):
+        """訪問記録を確定してリソースを解放"""
+        self.normalized_urls.close()
+        if self.page_cache is not None:
+            self.page_cache.close()
     
     def is_url_visited(self, url: str) -> bool:
         """Check if a URL has been visited"""
         normalized = self._normalize_url(url)
         return normalized in self.normalized_urls
     
-    def fetch_page(self, url: str) -> Optional[str]:
-        """Public method to fetch a page"""
-        return self._fetch_page(url)
+    def fetch_page(self, url: str, conditional: bool = False):
+        """Public method to fetch a page (returns NOT_MODIFIED for an unchanged page when conditional,
+        SKIPPED for a non-HTML or oversized page)"""
+        return self._fetch_page(url, conditional=conditional)
+    
+    def record_page_cache(self, url: str, links: List[Tuple[str, int]]):
+        """Save validators and extracted links of a converted page for the next conditional fetch"""
+        if self.page_cache is None:
+            return
+        with self._stats_lock:
+            validators = self._pending_validators.pop(url, None)
+        if validators is not None:
+            self.page_cache.put(url, validators[0], validators[1], links)
+    
+    def cached_links(self, url: str) -> List[Tuple[str, int]]:
+        """Links extracted from the page when it was last converted"""
+        if self.page_cache is None:
+            return []
+        return self.page_cache.get_links(url)
     
     def get_stats(self) -> Dict[str, int]:
         """統計情報を取得"""
         stats = self.stats.copy()
-        stats['auto_skipped'] = len([url for url, count in self.failed_url_counts.items() 
-                                   if count >= self.retry_config.get('skip_after_failures', 5)])
+        stats['auto_skipped'] = self._auto_skipped
         return stats
     
     def get_failed_urls_summary(self) -> Dict[str, int]:
@@ -5,6 +5,7 @@
 from enum import Enum
 from typing import Dict, Any, Optional
 import logging
+import threading
 
 
 class ErrorType(Enum):
@@ -115,6 +116,17 @@ class ConfigError(DocToMdError):
 class ErrorHandler:
     """エラー処理の統合管理クラス"""
     
+    # 重要度 -> ロガーのメソッド名
+    _LEVEL_FN = {
+        ErrorSeverity.CRITICAL: 'critical',
+        ErrorSeverity.HIGH: 'error',
+        ErrorSeverity.MEDIUM: 'warning',
+        ErrorSeverity.LOW: 'info',
+    }
+    
+    # 処理継続可能な重要度
+    CONTINUABLE = frozenset({ErrorSeverity.LOW, ErrorSeverity.MEDIUM})
+    
     def __init__(self, logger: Optional[logging.Logger] = None):
         self.logger = logger or logging.getLogger(__name__)
         self.error_stats = {
@@ -123,6 +135,8 @@ class ErrorHandler:
             ErrorType.FILE_SYSTEM_ERROR: 0,
             ErrorType.CONFIG_ERROR: 0
         }
+        # 複数スレッドからの呼び出しに備えて集計をロックで保護
+        self._stats_lock = threading.Lock()
     
     def handle_error(self, error: DocToMdError) -> bool:
         """
@@ -131,34 +145,24 @@ class ErrorHandler:
         Returns:
             bool: True=処理継続可能, False=処理中断が必要
         """
-        self.error_stats[error.error_type] += 1
+        with self._stats_lock:
+            self.error_stats[error.error_type] += 1
         
-        # ログレベルの決定
-        if error.severity == ErrorSeverity.CRITICAL:
-            self.logger.critical(f"[{error.error_type.value.upper()}] {error.message}", 
-                               exc_info=error.original_exception if error.original_exception else None)
-        elif error.severity == ErrorSeverity.HIGH:
-            if error.original_exception:
-                self.logger.exception(f"[{error.error_type.value.upper()}] {error.message}")
-            else:
-                self.logger.error(f"[{error.error_type.value.upper()}] {error.message}")
-        elif error.severity == ErrorSeverity.MEDIUM:
-            self.logger.warning(f"[{error.error_type.value.upper()}] {error.message}", 
-                              exc_info=error.original_exception if error.original_exception else None)
-        else:
-            self.logger.info(f"[{error.error_type.value.upper()}] {error.message}", 
-                           exc_info=error.original_exception if error.original_exception else None)
+        # 重要度に応じたログレベルで出力
+        log = getattr(self.logger, self._LEVEL_FN[error.severity])
+        log("[%s] %s", error.error_type.value.upper(), error.message,
+            exc_info=error.original_exception)
         
         # 詳細情報のログ出力
         if error.url:
-            self.logger.debug(f"  URL: {error.url}")
+            self.logger.debug("  URL: %s", error.url)
         if error.file_path:
-            self.logger.debug(f"  File: {error.file_path}")
+            self.logger.debug("  File: %s", error.file_path)
         if error.original_exception:
-            self.logger.debug(f"  Original: {error.original_exception}")
+            self.logger.debug("  Original: %s", error.original_exception)
         
         # 処理継続判定
-        return error.severity in [ErrorSeverity.LOW, ErrorSeverity.MEDIUM]
+        return error.severity in self.CONTINUABLE
     
     def should_retry(self, error: DocToMdError) -> bool:
         """エラーに対してリトライすべきかどうかを判定"""
@@ -175,6 +179,12 @@ class ErrorHandler:
         """エラー統計情報を取得"""
         return self.error_stats.copy()
     
+    def merge_error_stats(self, error_stats: Dict[ErrorType, int]):
+        """別プロセスで集計したエラー統計を加算"""
+        with self._stats_lock:
+            for error_type, count in error_stats.items():
+                self.error_stats[error_type] += count
+    
     def log_error_summary(self):
         """エラー統計のサマリーをログ出力"""
         total_errors = sum(self.error_stats.values())
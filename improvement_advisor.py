@@ -2,9 +2,12 @@
 実行可能な改善提案付きサマリーレポート機能
 """
 
+import io
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, TextIO, Tuple
+from collections import namedtuple
 from dataclasses import dataclass
+from functools import lru_cache
 from error_types import ErrorType
 
 
@@ -17,6 +20,204 @@ class Suggestion:
     category: str  # カテゴリ (PERFORMANCE, RELIABILITY, CONFIGURATION)
 
 
+@dataclass(frozen=True)
+class _StatsView:
+    """分析に使う集計値（analyze_resultsの冒頭で一度だけ計算）"""
+    total_crawled: int
+    total_failed: int
+    total_skipped: int
+    total_processed: int  # クロールの成功 + 失敗
+    converted: int  # 変換処理したページ数
+    images_downloaded: int
+    images_failed: int
+    network_errors: int
+    content_errors: int
+    fs_errors: int
+    total_errors: int
+    request_delay: float
+    console_level: str
+    total_time: float
+    
+    @classmethod
+    def from_results(cls,
+                     crawler_stats: Dict[str, int],
+                     converter_stats: Dict[str, int],
+                     error_stats: Dict[ErrorType, int],
+                     config: Dict[str, Any],
+                     total_time: float) -> '_StatsView':
+        total_crawled = crawler_stats.get('total_crawled', 0)
+        total_failed = crawler_stats.get('total_failed', 0)
+        return cls(
+            total_crawled=total_crawled,
+            total_failed=total_failed,
+            total_skipped=crawler_stats.get('total_skipped', 0),
+            total_processed=total_crawled + total_failed,
+            converted=converter_stats.get('total_processed', 0),
+            images_downloaded=converter_stats.get('images_downloaded', 0),
+            images_failed=converter_stats.get('images_failed', 0),
+            network_errors=error_stats.get(ErrorType.NETWORK_ERROR, 0),
+            content_errors=error_stats.get(ErrorType.CONTENT_EXTRACTION_ERROR, 0),
+            fs_errors=error_stats.get(ErrorType.FILE_SYSTEM_ERROR, 0),
+            total_errors=sum(error_stats.values()),
+            request_delay=config.get('execution', {}).get('request_delay', 1.0),
+            console_level=config.get('logging', {}).get('console_level', 'INFO'),
+            total_time=total_time,
+        )
+    
+    @property
+    def increased_delay(self) -> float:
+        """エラー多発時に提案するrequest_delay"""
+        return self.request_delay + 1.0
+    
+    @property
+    def slightly_increased_delay(self) -> float:
+        """エラー散発時に提案するrequest_delay"""
+        return self.request_delay + 0.5
+    
+    @property
+    def error_rate(self) -> float:
+        """ネットワークエラー率"""
+        return self.network_errors / self.total_processed if self.total_processed else 0.0
+    
+    @property
+    def content_error_rate(self) -> float:
+        """コンテンツ抽出エラー率"""
+        return self.content_errors / self.converted if self.converted else 0.0
+    
+    @property
+    def image_failure_rate(self) -> float:
+        """画像ダウンロード失敗率"""
+        total_images = self.images_downloaded + self.images_failed
+        return self.images_failed / total_images if total_images else 0.0
+    
+    @property
+    def pages_per_minute(self) -> float:
+        """1分あたりの処理ページ数"""
+        return (self.total_crawled / self.total_time) * 60 if self.total_time else 0.0
+    
+    @property
+    def skip_rate(self) -> float:
+        """スキップ率"""
+        total = self.total_crawled + self.total_skipped
+        return self.total_skipped / total if total else 0.0
+    
+    @property
+    def total_operations(self) -> int:
+        """クロールと変換の総処理数"""
+        return self.total_processed + self.converted
+    
+    @property
+    def overall_error_rate(self) -> float:
+        """全体のエラー率"""
+        total_operations = self.total_operations
+        return self.total_errors / total_operations if total_operations else 0.0
+
+
+# 改善提案のルール
+#   group: 同じグループ内では最初に該当したルールのみ採用する（Noneは単独ルール）
+#   condition: _StatsViewを受け取り、提案が必要かどうかを返す
+#   issue, suggestion: _StatsViewを v として展開するフォーマット文字列
+Rule = namedtuple('Rule', 'group condition priority category issue suggestion')
+
+RULES = (
+    # ネットワーク関連の分析
+    Rule('network', lambda v: v.error_rate > 0.3 and v.request_delay < 2.0,  # 30%以上
+         "HIGH", "RELIABILITY",
+         "ネットワークエラーが多発しています（{v.error_rate:.1%}）",
+         "config.yamlのexecution.request_delayを{v.increased_delay}秒以上に増やすことを検討してください"),
+    Rule('network', lambda v: v.error_rate > 0.3,
+         "MEDIUM", "RELIABILITY",
+         "ネットワークエラーが多発しています（{v.error_rate:.1%}）",
+         "対象サイトのサーバー負荷が高い可能性があります。時間を変えて再実行することを検討してください"),
+    Rule('network', lambda v: v.error_rate > 0.1,  # 10-30%
+         "MEDIUM", "RELIABILITY",
+         "ネットワークエラーが散発しています（{v.error_rate:.1%}）",
+         "request_delayを{v.slightly_increased_delay}秒に増やすことで安定性が向上する可能性があります"),
+    
+    # コンテンツ処理の分析
+    Rule('content', lambda v: v.content_error_rate > 0.2,  # 20%以上
+         "HIGH", "CONFIGURATION",
+         "コンテンツ抽出エラーが多発しています（{v.content_error_rate:.1%}）",
+         "config.yamlのextractor.content_selectorの設定が不適切な可能性があります。対象サイトの構造を再確認してください"),
+    Rule('content', lambda v: v.content_error_rate > 0.05,  # 5-20%
+         "MEDIUM", "CONFIGURATION",
+         "コンテンツ抽出エラーが発生しています（{v.content_error_rate:.1%}）",
+         "一部のページでコンテンツ抽出に失敗しています。content_selectorの調整を検討してください"),
+    Rule(None, lambda v: v.converted > 0 and v.image_failure_rate > 0.3,
+         "MEDIUM", "CONFIGURATION",
+         "画像ダウンロード失敗率が高いです（{v.image_failure_rate:.1%}）",
+         "画像ダウンロードを無効にする（output.download_images: false）ことを検討してください"),
+    
+    # パフォーマンスの分析
+    Rule(None, lambda v: v.total_crawled > 0 and v.total_time > 0 and v.pages_per_minute < 5,  # 1分間に5ページ未満
+         "LOW", "PERFORMANCE",
+         "処理速度が遅いです（{v.pages_per_minute:.1f}ページ/分）",
+         "request_delayの値を下げるか、ログレベルを調整することで高速化できる可能性があります"),
+    Rule(None, lambda v: v.total_crawled > 0 and v.total_time > 0 and v.images_downloaded > 100,
+         "LOW", "PERFORMANCE",
+         "大量の画像をダウンロードしています（{v.images_downloaded}個）",
+         "ストレージ容量と処理時間の観点から、必要に応じてdownload_imagesを無効にすることを検討してください"),
+    
+    # 設定の分析（除外パターンの効果）
+    Rule('skip', lambda v: v.total_crawled > 0 and v.skip_rate > 0.5,  # 50%以上がスキップ
+         "MEDIUM", "CONFIGURATION",
+         "多くのURLがスキップされています（{v.skip_rate:.1%}）",
+         "crawler.exclude_patternsが過度に制限的な可能性があります。パターンの見直しを検討してください"),
+    Rule('skip', lambda v: v.skip_rate < 0.1 and v.total_crawled > 50,  # 10%未満かつある程度の規模
+         "LOW", "CONFIGURATION",
+         "除外パターンの効果が薄いです（スキップ率{v.skip_rate:.1%}）",
+         "不要なページを除外するパターンを追加することで、効率的な処理が可能になります"),
+    Rule(None, lambda v: v.console_level == 'DEBUG' and v.total_crawled > 20,
+         "LOW", "PERFORMANCE",
+         "DEBUGレベルのコンソール出力が有効です",
+         "大量処理時はconsole_levelをINFOに変更することで出力量を減らせます"),
+    
+    # 信頼性の分析
+    Rule('reliability', lambda v: v.overall_error_rate > 0.4,  # 40%以上
+         "HIGH", "RELIABILITY",
+         "全体的なエラー率が高いです（{v.overall_error_rate:.1%}）",
+         "設定の見直しと対象サイトの再確認を強く推奨します。特にURLとCSSセレクターの確認をしてください"),
+    Rule('reliability', lambda v: v.overall_error_rate > 0.2,  # 20-40%
+         "MEDIUM", "RELIABILITY",
+         "エラー率がやや高めです（{v.overall_error_rate:.1%}）",
+         "設定の最適化によりエラー率を下げることができる可能性があります"),
+    Rule(None, lambda v: v.total_operations > 0 and v.fs_errors > 0,
+         "HIGH", "RELIABILITY",
+         "ファイルシステムエラーが発生しています（{v.fs_errors}件）",
+         "出力ディレクトリの権限とディスク容量を確認してください"),
+)
+
+
+@lru_cache(maxsize=8)
+def _matching_rules(view: _StatsView) -> Tuple[Rule, ...]:
+    """条件を満たすルールを評価（同じ集計値に対する結果は再利用）"""
+    matched = []
+    matched_groups = set()
+    
+    for rule in RULES:
+        if rule.group in matched_groups or not rule.condition(view):
+            continue
+        if rule.group is not None:
+            matched_groups.add(rule.group)
+        matched.append(rule)
+    
+    return tuple(matched)
+
+
+def _evaluate_rules(view: _StatsView) -> List[Suggestion]:
+    """ルールを評価して改善提案を生成
+    
+    Suggestionは変更可能なため、キャッシュするのは該当したルールだけにして
+    呼び出しのたびに新しいインスタンスを作る。
+    """
+    return [Suggestion(
+        issue=rule.issue.format(v=view),
+        suggestion=rule.suggestion.format(v=view),
+        priority=rule.priority,
+        category=rule.category
+    ) for rule in _matching_rules(view)]
+
+
 class ImprovementAdvisor:
     """改善提案システム"""
     
@@ -31,235 +232,48 @@ class ImprovementAdvisor:
                        config: Dict[str, Any],
                        total_processing_time: float = 0) -> List[Suggestion]:
         """実行結果を分析して改善提案を生成"""
-        self.suggestions = []
-        
-        # ネットワーク関連の分析
-        self._analyze_network_issues(crawler_stats, error_stats, config)
-        
-        # コンテンツ処理の分析
-        self._analyze_content_processing(converter_stats, error_stats)
-        
-        # パフォーマンスの分析
-        self._analyze_performance(crawler_stats, converter_stats, total_processing_time)
-        
-        # 設定の分析
-        self._analyze_configuration(config, crawler_stats, error_stats)
-        
-        # 信頼性の分析
-        self._analyze_reliability(error_stats, crawler_stats, converter_stats)
+        view = _StatsView.from_results(crawler_stats, converter_stats, error_stats,
+                                       config, total_processing_time)
         
+        self.suggestions = _evaluate_rules(view)
         return self.suggestions
     
-    def _analyze_network_issues(self, crawler_stats: Dict[str, int], 
-                               error_stats: Dict[ErrorType, int], 
-                               config: Dict[str, Any]):
-        """ネットワーク関連の問題を分析"""
-        network_errors = error_stats.get(ErrorType.NETWORK_ERROR, 0)
-        total_processed = crawler_stats.get('total_crawled', 0) + crawler_stats.get('total_failed', 0)
-        
-        if total_processed == 0:
-            return
-            
-        error_rate = network_errors / total_processed
-        request_delay = config.get('execution', {}).get('request_delay', 1.0)
-        
-        # ネットワークエラー率が高い場合
-        if error_rate > 0.3:  # 30%以上
-            if request_delay < 2.0:
-                self.suggestions.append(Suggestion(
-                    issue=f"ネットワークエラーが多発しています（{error_rate:.1%}）",
-                    suggestion=f"config.yamlのexecution.request_delayを{request_delay + 1.0}秒以上に増やすことを検討してください",
-                    priority="HIGH",
-                    category="RELIABILITY"
-                ))
-            else:
-                self.suggestions.append(Suggestion(
-                    issue=f"ネットワークエラーが多発しています（{error_rate:.1%}）",
-                    suggestion="対象サイトのサーバー負荷が高い可能性があります。時間を変えて再実行することを検討してください",
-                    priority="MEDIUM",
-                    category="RELIABILITY"
-                ))
-        elif error_rate > 0.1:  # 10-30%
-            self.suggestions.append(Suggestion(
-                issue=f"ネットワークエラーが散発しています（{error_rate:.1%}）",
-                suggestion=f"request_delayを{request_delay + 0.5}秒に増やすことで安定性が向上する可能性があります",
-                priority="MEDIUM",
-                category="RELIABILITY"
-            ))
-    
-    def _analyze_content_processing(self, converter_stats: Dict[str, int], 
-                                  error_stats: Dict[ErrorType, int]):
-        """コンテンツ処理の分析"""
-        content_errors = error_stats.get(ErrorType.CONTENT_EXTRACTION_ERROR, 0)
-        total_processed = converter_stats.get('total_processed', 0)
-        
-        if total_processed == 0:
-            return
-            
-        content_error_rate = content_errors / total_processed
-        
-        # コンテンツ抽出エラー率が高い場合
-        if content_error_rate > 0.2:  # 20%以上
-            self.suggestions.append(Suggestion(
-                issue=f"コンテンツ抽出エラーが多発しています（{content_error_rate:.1%}）",
-                suggestion="config.yamlのextractor.content_selectorの設定が不適切な可能性があります。対象サイトの構造を再確認してください",
-                priority="HIGH",
-                category="CONFIGURATION"
-            ))
-        elif content_error_rate > 0.05:  # 5-20%
-            self.suggestions.append(Suggestion(
-                issue=f"コンテンツ抽出エラーが発生しています（{content_error_rate:.1%}）",
-                suggestion="一部のページでコンテンツ抽出に失敗しています。content_selectorの調整を検討してください",
-                priority="MEDIUM",
-                category="CONFIGURATION"
-            ))
-        
-        # 画像ダウンロードの分析
-        images_downloaded = converter_stats.get('images_downloaded', 0)
-        images_failed = converter_stats.get('images_failed', 0)
-        
-        if images_failed > 0 and images_downloaded + images_failed > 0:
-            image_failure_rate = images_failed / (images_downloaded + images_failed)
-            if image_failure_rate > 0.3:
-                self.suggestions.append(Suggestion(
-                    issue=f"画像ダウンロード失敗率が高いです（{image_failure_rate:.1%}）",
-                    suggestion="画像ダウンロードを無効にする（output.download_images: false）ことを検討してください",
-                    priority="MEDIUM",
-                    category="CONFIGURATION"
-                ))
+    @staticmethod
+    def _partition(suggestions: List[Suggestion]) -> Dict[str, List[Suggestion]]:
+        """改善提案を優先度別に振り分け（HIGH, MEDIUM, LOWの順、未知の優先度はその後）"""
+        buckets: Dict[str, List[Suggestion]] = {"HIGH": [], "MEDIUM": [], "LOW": []}
+        for suggestion in suggestions:
+            buckets.setdefault(suggestion.priority, []).append(suggestion)
+        return buckets
     
-    def _analyze_performance(self, crawler_stats: Dict[str, int], 
-                           converter_stats: Dict[str, int], 
-                           total_time: float):
-        """パフォーマンスの分析"""
-        total_pages = crawler_stats.get('total_crawled', 0)
+    def generate_report(self, suggestions: List[Suggestion],
+                        out: Optional[TextIO] = None) -> Optional[str]:
+        """改善提案レポートを生成
         
-        if total_pages == 0 or total_time == 0:
-            return
-            
-        pages_per_minute = (total_pages / total_time) * 60
+        outを指定した場合はそのストリームに直接書き込んでNoneを返す。
+        省略した場合はレポート文字列を返す。
+        """
+        buf = io.StringIO() if out is None else out
+        write = buf.write
         
-        # 処理速度の分析
-        if pages_per_minute < 5:  # 1分間に5ページ未満
-            self.suggestions.append(Suggestion(
-                issue=f"処理速度が遅いです（{pages_per_minute:.1f}ページ/分）",
-                suggestion="request_delayの値を下げるか、ログレベルを調整することで高速化できる可能性があります",
-                priority="LOW",
-                category="PERFORMANCE"
-            ))
-        
-        # 大量画像処理の警告
-        images_downloaded = converter_stats.get('images_downloaded', 0)
-        if images_downloaded > 100:
-            self.suggestions.append(Suggestion(
-                issue=f"大量の画像をダウンロードしています（{images_downloaded}個）",
-                suggestion="ストレージ容量と処理時間の観点から、必要に応じてdownload_imagesを無効にすることを検討してください",
-                priority="LOW",
-                category="PERFORMANCE"
-            ))
-    
-    def _analyze_configuration(self, config: Dict[str, Any], 
-                             crawler_stats: Dict[str, int], 
-                             error_stats: Dict[ErrorType, int]):
-        """設定の分析"""
-        # 除外パターンの効果分析
-        total_skipped = crawler_stats.get('total_skipped', 0)
-        total_crawled = crawler_stats.get('total_crawled', 0)
-        
-        if total_crawled > 0:
-            skip_rate = total_skipped / (total_crawled + total_skipped)
-            
-            if skip_rate > 0.5:  # 50%以上がスキップ
-                self.suggestions.append(Suggestion(
-                    issue=f"多くのURLがスキップされています（{skip_rate:.1%}）",
-                    suggestion="crawler.exclude_patternsが過度に制限的な可能性があります。パターンの見直しを検討してください",
-                    priority="MEDIUM",
-                    category="CONFIGURATION"
-                ))
-            elif skip_rate < 0.1 and total_crawled > 50:  # 10%未満かつある程度の規模
-                self.suggestions.append(Suggestion(
-                    issue=f"除外パターンの効果が薄いです（スキップ率{skip_rate:.1%}）",
-                    suggestion="不要なページを除外するパターンを追加することで、効率的な処理が可能になります",
-                    priority="LOW",
-                    category="CONFIGURATION"
-                ))
-        
-        # ログ設定の提案
-        log_config = config.get('logging', {})
-        console_level = log_config.get('console_level', 'INFO')
-        file_level = log_config.get('file_level', 'DEBUG')
-        
-        if console_level == 'DEBUG' and total_crawled > 20:
-            self.suggestions.append(Suggestion(
-                issue="DEBUGレベルのコンソール出力が有効です",
-                suggestion="大量処理時はconsole_levelをINFOに変更することで出力量を減らせます",
-                priority="LOW",
-                category="PERFORMANCE"
-            ))
-    
-    def _analyze_reliability(self, error_stats: Dict[ErrorType, int],
-                           crawler_stats: Dict[str, int],
-                           converter_stats: Dict[str, int]):
-        """信頼性の分析"""
-        total_errors = sum(error_stats.values())
-        total_operations = (crawler_stats.get('total_crawled', 0) + 
-                          crawler_stats.get('total_failed', 0) +
-                          converter_stats.get('total_processed', 0))
-        
-        if total_operations == 0:
-            return
-            
-        overall_error_rate = total_errors / total_operations
-        
-        # 全体的なエラー率の分析
-        if overall_error_rate > 0.4:  # 40%以上
-            self.suggestions.append(Suggestion(
-                issue=f"全体的なエラー率が高いです（{overall_error_rate:.1%}）",
-                suggestion="設定の見直しと対象サイトの再確認を強く推奨します。特にURLとCSSセレクターの確認をしてください",
-                priority="HIGH",
-                category="RELIABILITY"
-            ))
-        elif overall_error_rate > 0.2:  # 20-40%
-            self.suggestions.append(Suggestion(
-                issue=f"エラー率がやや高めです（{overall_error_rate:.1%}）",
-                suggestion="設定の最適化によりエラー率を下げることができる可能性があります",
-                priority="MEDIUM",
-                category="RELIABILITY"
-            ))
-        
-        # ファイルシステムエラーの分析
-        fs_errors = error_stats.get(ErrorType.FILE_SYSTEM_ERROR, 0)
-        if fs_errors > 0:
-            self.suggestions.append(Suggestion(
-                issue=f"ファイルシステムエラーが発生しています（{fs_errors}件）",
-                suggestion="出力ディレクトリの権限とディスク容量を確認してください",
-                priority="HIGH",
-                category="RELIABILITY"
-            ))
-    
-    def generate_report(self, suggestions: List[Suggestion]) -> str:
-        """改善提案レポートを生成"""
         if not suggestions:
-            return "実行に問題はありませんでした。設定は適切に動作しています。"
-        
-        # 優先度でソート
-        priority_order = {"HIGH": 0, "MEDIUM": 1, "LOW": 2}
-        sorted_suggestions = sorted(suggestions, key=lambda x: priority_order.get(x.priority, 3))
-        
-        report_lines = ["=== 改善提案レポート ==="]
-        
-        current_priority = None
-        for suggestion in sorted_suggestions:
-            if current_priority != suggestion.priority:
-                current_priority = suggestion.priority
-                report_lines.append(f"\n【{current_priority}優先度】")
+            write("実行に問題はありませんでした。設定は適切に動作しています。")
+        else:
+            write("=== 改善提案レポート ===")
             
-            report_lines.append(f"問題: {suggestion.issue}")
-            report_lines.append(f"提案: {suggestion.suggestion}")
-            report_lines.append(f"カテゴリ: {suggestion.category}")
-            report_lines.append("")
+            # 優先度順に出力（2行目以降は改行を前置する）
+            for priority, bucket in self._partition(suggestions).items():
+                if not bucket:
+                    continue
+                
+                write(f"\n\n【{priority}優先度】")
+                for suggestion in bucket:
+                    write(f"\n問題: {suggestion.issue}")
+                    write(f"\n提案: {suggestion.suggestion}")
+                    write(f"\nカテゴリ: {suggestion.category}")
+                    write("\n")
         
-        return "\n".join(report_lines)
+        return buf.getvalue() if out is None else None
     
     def log_suggestions(self, suggestions: List[Suggestion]):
         """改善提案をログに出力"""
@@ -270,9 +284,10 @@ class ImprovementAdvisor:
         self.logger.info("=== 改善提案 ===")
         
         # 優先度別に集計
-        high_priority = [s for s in suggestions if s.priority == "HIGH"]
-        medium_priority = [s for s in suggestions if s.priority == "MEDIUM"]
-        low_priority = [s for s in suggestions if s.priority == "LOW"]
+        buckets = self._partition(suggestions)
+        high_priority = buckets["HIGH"]
+        medium_priority = buckets["MEDIUM"]
+        low_priority = buckets["LOW"]
         
         if high_priority:
             self.logger.warning(f"緊急対応が必要な問題: {len(high_priority)}件")
@@ -3,21 +3,13 @@
 構造化ログレベル、ファイル出力、ローテーション機能を提供
 """
 
+import atexit
 import logging
 import logging.handlers
+import queue
 import sys
 from pathlib import Path
 from typing import Dict, Any, Optional
-from enum import Enum
-
-
-class LogLevel(Enum):
-    """ログレベルの定義"""
-    DEBUG = "DEBUG"
-    INFO = "INFO"
-    WARNING = "WARNING"
-    ERROR = "ERROR"
-    CRITICAL = "CRITICAL"
 
 
 class LoggingManager:
@@ -31,11 +23,15 @@ class LoggingManager:
         # ログ設定を取得
         self.log_config = self._get_log_config()
         
-        # ルートロガーの設定
-        self._setup_root_logger()
-        
-        # ログディレクトリの作成
+        # ログディレクトリの作成（ファイルハンドラーの作成前に行う）
         self._ensure_log_directory()
+        self._log_file_path = Path(self.log_config['log_dir']) / f"{self.app_name}.log"
+        
+        # ルートロガーの設定（出力は別スレッドのリスナーが行う）
+        self._setup_root_logger()
+        self._listener.start()
+        self._closed = False
+        atexit.register(self.close)
     
     def _get_log_config(self) -> Dict[str, Any]:
         """ログ設定を取得（デフォルト値付き）"""
@@ -57,18 +53,17 @@ class LoggingManager:
             if key not in log_config:
                 log_config[key] = default_value
         
+        # ログレベルは数値に一度だけ解決しておく
+        log_config['console_level_int'] = self._get_log_level(log_config['console_level'])
+        log_config['file_level_int'] = self._get_log_level(log_config['file_level'])
+        
         return log_config
     
     def _get_log_level(self, level_str: str) -> int:
         """文字列からログレベルを取得"""
-        level_map = {
-            'DEBUG': logging.DEBUG,
-            'INFO': logging.INFO,
-            'WARNING': logging.WARNING,
-            'ERROR': logging.ERROR,
-            'CRITICAL': logging.CRITICAL
-        }
-        return level_map.get(level_str.upper(), logging.INFO)
+        # 登録済みのレベル名には数値が返る（未知の名前は "Level X" 形式の文字列）
+        level = logging.getLevelName(level_str.upper())
+        return level if isinstance(level, int) else logging.INFO
     
     def _ensure_log_directory(self):
         """ログディレクトリの存在確保"""
@@ -92,31 +87,50 @@ class LoggingManager:
         )
         
         # コンソールハンドラーの設定
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(self._get_log_level(self.log_config['console_level']))
-        console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
+        self._console_handler = logging.StreamHandler(sys.stdout)
+        self._console_handler.setLevel(self.log_config['console_level_int'])
+        self._console_handler.setFormatter(formatter)
+        handlers = [self._console_handler]
         
         # ファイルハンドラーの設定（有効な場合）
+        self._file_handler: Optional[logging.Handler] = None
         if self.log_config['enable_file_logging']:
-            self._setup_file_handler(root_logger, formatter)
+            self._file_handler = self._setup_file_handler(formatter)
+            handlers.append(self._file_handler)
+        
+        # 呼び出し側はキューに積むだけにし、書式化とファイル出力はリスナーのスレッドで行う
+        log_queue = queue.SimpleQueue()
+        self._queue_handler = logging.handlers.QueueHandler(log_queue)
+        self._listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        self._update_queue_level()
+        root_logger.addHandler(self._queue_handler)
     
-    def _setup_file_handler(self, logger: logging.Logger, formatter: logging.Formatter):
-        """ファイルハンドラーの設定（ローテーション付き）"""
-        log_file = Path(self.log_config['log_dir']) / f"{self.app_name}.log"
-        
+    def _update_queue_level(self):
+        """どのハンドラーも出力しないレコードはキューに積まないようにする"""
+        self._queue_handler.setLevel(min(handler.level for handler in self._listener.handlers))
+    
+    def close(self):
+        """キューに残ったログを出力してリスナーを停止"""
+        if not self._closed:
+            self._listener.stop()
+            self._closed = True
+    
+    def _setup_file_handler(self, formatter: logging.Formatter) -> logging.Handler:
+        """ファイルハンドラーの作成（ローテーション付き）"""
         # ローテーションファイルハンドラー
         max_bytes = self.log_config['max_file_size_mb'] * 1024 * 1024  # MBをバイトに変換
         file_handler = logging.handlers.RotatingFileHandler(
-            filename=str(log_file),
+            filename=str(self._log_file_path),
             maxBytes=max_bytes,
             backupCount=self.log_config['backup_count'],
             encoding='utf-8'
         )
         
-        file_handler.setLevel(self._get_log_level(self.log_config['file_level']))
+        file_handler.setLevel(self.log_config['file_level_int'])
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        return file_handler
     
     def get_logger(self, name: str) -> logging.Logger:
         """名前付きロガーを取得"""
@@ -129,17 +143,26 @@ class LoggingManager:
     
     def set_log_level(self, console_level: Optional[str] = None, file_level: Optional[str] = None):
         """実行時にログレベルを変更"""
-        root_logger = logging.getLogger()
-        
-        for handler in root_logger.handlers:
-            if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
-                # コンソールハンドラー
-                if console_level:
-                    handler.setLevel(self._get_log_level(console_level))
-            elif isinstance(handler, logging.handlers.RotatingFileHandler):
-                # ファイルハンドラー
-                if file_level:
-                    handler.setLevel(self._get_log_level(file_level))
+        # 変更前に積まれたログが新しいレベルで判定されないよう、キューを出力し切ってから変更する
+        if not self._closed:
+            self._listener.stop()
+        
+        # 指定されたレベルを一度だけ解決して設定に反映
+        if console_level:
+            self.log_config['console_level'] = console_level
+            self.log_config['console_level_int'] = self._get_log_level(console_level)
+        if file_level:
+            self.log_config['file_level'] = file_level
+            self.log_config['file_level_int'] = self._get_log_level(file_level)
+        
+        if console_level:
+            self._console_handler.setLevel(self.log_config['console_level_int'])
+        if file_level and self._file_handler is not None:
+            self._file_handler.setLevel(self.log_config['file_level_int'])
+        
+        self._update_queue_level()
+        if not self._closed:
+            self._listener.start()
     
     def log_system_info(self):
         """システム情報をログ出力"""
@@ -172,11 +195,11 @@ class LoggingManager:
                 'backup_count': self.log_config['backup_count']
             })
             
-            # ログファイルのサイズ情報
-            log_file = Path(self.log_config['log_dir']) / f"{self.app_name}.log"
-            if log_file.exists():
-                stats['current_log_file_size_mb'] = round(log_file.stat().st_size / (1024 * 1024), 2)
-            else:
+            # ログファイルのサイズ情報（存在確認とサイズ取得を1回のstatで行う）
+            try:
+                size = self._log_file_path.stat().st_size
+                stats['current_log_file_size_mb'] = round(size / (1024 * 1024), 2)
+            except FileNotFoundError:
                 stats['current_log_file_size_mb'] = 0
         
         return stats
@@ -210,11 +233,12 @@ class StructuredLogger:
     
     def _log_with_context(self, level: int, message: str, **kwargs):
         """コンテキスト情報付きログ出力"""
+        # 出力されないレベルの場合はメッセージを組み立てない
+        if not self.logger.isEnabledFor(level):
+            return
+        
         if kwargs:
-            context_parts = []
-            for key, value in kwargs.items():
-                context_parts.append(f"{key}={value}")
-            context_str = " | ".join(context_parts)
+            context_str = " | ".join(f"{key}={value}" for key, value in kwargs.items())
             full_message = f"{message} | {context_str}"
         else:
             full_message = message
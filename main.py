@@ -7,10 +7,15 @@
 import sys
 import time
 import argparse
+import functools
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from bs4 import BeautifulSoup
 from config_manager import ConfigManager
-from crawler import WebCrawler
-from converter import MarkdownConverter
+from crawler import NOT_MODIFIED, SKIPPED, WebCrawler
+from converter import MarkdownConverter, init_worker_converter, process_page_in_worker
 from error_types import ErrorHandler, FileSystemError, ErrorSeverity
 from logging_manager import setup_logging, StructuredLogger
 from improvement_advisor import ImprovementAdvisor
@@ -18,8 +23,11 @@ from recovery_manager import RecoveryManager
 
 
 class DocToMarkdownTool:
-    def __init__(self, config_path="config.yaml"):
-        self.config_manager = ConfigManager(config_path)
+    # 進捗を標準出力に表示する間隔（処理ページ数）
+    PROGRESS_INTERVAL = 10
+    
+    def __init__(self, config_path="config.yaml", config_cache_dir=None):
+        self.config_manager = ConfigManager(config_path, cache_dir=config_cache_dir)
         
         # 包括的ログシステムの初期化
         self.logging_manager = setup_logging(self.config_manager.config, "doc_to_md")
@@ -33,6 +41,19 @@ class DocToMarkdownTool:
         self.crawler = WebCrawler(self.config_manager.config)
         self.converter = MarkdownConverter(self.config_manager.config)
         
+        # 変換をワーカープロセスで行う場合のプール（0の場合はスレッドで変換する）。
+        # ログのリスナースレッド等が動いているためforkではなくspawnで起動する
+        convert_processes = self.config_manager.get_execution_config().get('convert_processes', 0)
+        self._convert_processes = convert_processes
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        if convert_processes > 0:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=convert_processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker_converter,
+                initargs=(self.config_manager.config,)
+            )
+        
         # エラーハンドラーの初期化
         self.error_handler = ErrorHandler(self.logger)
         
@@ -127,16 +148,20 @@ class DocToMarkdownTool:
             # 予期しないエラー時も状態を保存
             self._save_interruption_state()
             raise
+        finally:
+            self.recovery_manager.flush()
+            self.crawler.close()
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
     
     def _crawl_and_convert(self, resume_from_recovery: bool = False):
         """クロールと変換を統合実行（リカバリ対応）"""
         start_time = time.time()
         
         target_config = self.config_manager.get_target_site()
-        execution_config = self.config_manager.get_execution_config()
         
         start_url = target_config.get('start_url', '')
-        request_delay = execution_config.get('request_delay', 1.0)
+        concurrency = self.config_manager.get_crawler_config().get('concurrency', 1)
         
         if not start_url:
             print("エラー: start_urlが設定されていません")
@@ -144,19 +169,15 @@ class DocToMarkdownTool:
         
         # 統計情報とトラッキング（リカバリからの復元対応）
         if resume_from_recovery:
-            processed_count = self.recovery_manager.state.processed_count
-            success_count = self.recovery_manager.state.success_count
-            failed_count = self.recovery_manager.state.failed_count
-            crawled_urls = self.recovery_manager.state.crawled_urls.copy()
-            
-            # クローラーの状態を復元
-            self.crawler.visited_urls = self.recovery_manager.state.visited_urls.copy()
-            self.crawler.failed_url_counts = self.recovery_manager.state.failed_url_counts.copy()
+            # 読み込んだ状態は以降参照しないため、コピーせずにそのまま引き継ぐ
+            state = self.recovery_manager.state
+            processed_count = state.processed_count
+            success_count = state.success_count
+            failed_count = state.failed_count
+            crawled_urls = state.crawled_urls
             
-            # 正規化URLマップを再構築
-            for url in self.recovery_manager.state.visited_urls:
-                normalized = self.crawler._normalize_url(url)
-                self.crawler.normalized_urls[normalized] = url
+            # クローラーの状態を復元（正規化URLマップは一括登録で再構築）
+            self.crawler.restore_visited_state(state.visited_urls, state.failed_url_counts)
             
             # 統計を更新
             self.crawler.stats['total_crawled'] = len(crawled_urls)
@@ -168,81 +189,149 @@ class DocToMarkdownTool:
             success_count = 0
             failed_count = 0
             crawled_urls = []
+            
+            # 永続化された訪問記録が残っていても最初から処理する
+            self.crawler.reset_visited_state()
+        
+        # 重複ページとして変換を省略した数（成功・失敗のどちらにも数えない）
+        duplicate_count = 0
+        # 前回の実行から変更がなく変換を省略した数（成功・失敗のどちらにも数えない）
+        not_modified_count = 0
+        # HTML以外やサイズ上限超過で取得対象外とした数（成功・失敗のどちらにも数えない）
+        skipped_count = 0
+        
+        # ループ内で繰り返し参照する属性はローカル変数に束縛しておく
+        crawler = self.crawler
+        url_queue = crawler.url_queue
+        convert_page = self._convert_page
+        converter = self.converter
+        use_page_cache = crawler.page_cache is not None
+        logger = self.logger
+        progress_interval = self.PROGRESS_INTERVAL
         
         # URLキューを初期化（リカバリ時も開始URLから再探索）
-        self.crawler.url_queue.put(start_url, priority=0)
+        url_queue.put(start_url, priority=0)
         
-        while not self.crawler.url_queue.empty():
-            current_url = self.crawler.url_queue.get()
-            
-            # 重複チェック（パブリックAPIを使用）
-            if self.crawler.is_url_visited(current_url):
-                self.crawler.stats['total_skipped'] += 1
-                continue
-            
-            processed_count += 1
-            # 総数計算: 処理済み + 現在のキュー内URL数 + 成功/失敗済み
-            total_count = processed_count + self.crawler.url_queue.size()
-            print(f"[{processed_count}/{total_count}] 処理中: ({current_url})")
-            
-            try:
-                # ページを取得（パブリックAPIを使用）
-                html_content = self.crawler.fetch_page(current_url)
-                if html_content is None:
-                    failed_count += 1
-                    continue
-                
-                # 訪問済みとしてマーク（パブリックAPIを使用）
-                self.crawler.mark_url_as_visited(current_url)
-                crawled_urls.append(current_url)  # 成功したURLを記録
-                
-                # コンテンツを変換・保存
-                file_path = self.converter.process_page(current_url, html_content)
-                if file_path:
-                    success_count += 1
-                    print(f"  → 保存: {file_path}")
-                else:
-                    failed_count += 1
-                    print(f"  → 変換失敗")
-                
-                # 新しいリンクを抽出してキューに追加（パブリックAPIを使用）
-                links = self.crawler.extract_links_from_content(current_url, html_content)
-                added_count = 0
-                
-                for link_url, priority in links:
-                    if not self.crawler.is_url_visited(link_url):
-                        self.crawler.url_queue.put(link_url, priority)
-                        added_count += 1
+        # 取得中のページ数がconcurrencyを保つよう、完了した分だけ次のURLを投入する。
+        # 取得が完了したページは変換ワーカーに渡し、変換（CPU処理）と次ページの取得（ネットワーク待ち）を並行させる。
+        # キュー操作・集計・状態保存はメインスレッドで完了した順に行い、
+        # リクエスト間隔はクローラー側でホスト単位に制御される
+        in_flight: Dict[Future, str] = {}  # 取得中のFuture -> URL
+        in_flight_normalized: Set[str] = set()
+        converting: Dict[Future, str] = {}  # 変換中のFuture -> URL
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as fetch_pool, \
+                ThreadPoolExecutor(max_workers=max(concurrency, self._convert_processes)) as convert_pool:
+            while True:
+                # 空いている枠に次のURLを投入
+                while len(in_flight) < concurrency:
+                    next_url = self._next_url(in_flight_normalized)
+                    if next_url is None:
+                        break
+                    # 前回の出力が残っているページのみ条件付きリクエストで取得する
+                    conditional = use_page_cache and converter.output_path(next_url).exists()
+                    in_flight[fetch_pool.submit(crawler.fetch_page, next_url, conditional)] = next_url
                 
-                if added_count > 0:
-                    print(f"  → 新しいリンク{added_count}個を発見")
+                if not in_flight and not converting:
+                    break
                 
-                # 定期的な状態保存
-                self.recovery_manager.save_state(
-                    start_url=start_url,
-                    visited_urls=self.crawler.visited_urls,
-                    failed_url_counts=self.crawler.failed_url_counts,
-                    processed_count=processed_count,
-                    success_count=success_count,
-                    failed_count=failed_count,
-                    crawled_urls=crawled_urls
-                )
+                done, _ = wait(in_flight.keys() | converting.keys(), return_when=FIRST_COMPLETED)
                 
-                # リクエスト間隔の調整
-                if request_delay > 0 and not self.crawler.url_queue.empty():
-                    time.sleep(request_delay)
+                for future in done:
+                    if future in converting:
+                        current_url = converting.pop(future)
+                        try:
+                            file_path, links, duplicate_of = future.result()
+                            if duplicate_of is not None:
+                                duplicate_count += 1
+                                logger.info("重複コンテンツのためスキップ: %s (%s と重複)", current_url, duplicate_of)
+                            elif file_path:
+                                success_count += 1
+                                logger.debug("保存: %s", file_path)
+                                crawler.record_page_cache(current_url, links)
+                            else:
+                                failed_count += 1
+                                logger.warning("変換失敗: %s", current_url)
+                            
+                            # 新しいリンクをキューに追加（パブリックAPIを使用）
+                            added_count = crawler.enqueue_links(links)
+                            if added_count > 0:
+                                logger.debug("新しいリンク%d個を発見: %s", added_count, current_url)
+                            
+                            # 定期的な状態保存
+                            self.recovery_manager.save_state(
+                                start_url=start_url,
+                                visited_urls=crawler.visited_urls,
+                                failed_url_counts=crawler.failed_url_counts,
+                                processed_count=processed_count,
+                                success_count=success_count,
+                                failed_count=failed_count,
+                                crawled_urls=crawled_urls
+                            )
+                            
+                        except Exception as e:
+                            error = FileSystemError(
+                                message="ページ処理中の予期しないエラー",
+                                file_path="unknown",
+                                severity=ErrorSeverity.MEDIUM,
+                                original_exception=e
+                            )
+                            self.error_handler.handle_error(error)
+                            failed_count += 1
+                        continue
                     
-            except Exception as e:
-                error = FileSystemError(
-                    message="ページ処理中の予期しないエラー",
-                    file_path="unknown",
-                    severity=ErrorSeverity.MEDIUM,
-                    original_exception=e
-                )
-                self.error_handler.handle_error(error)
-                print(f"  → エラー: {e}")
-                failed_count += 1
-                continue
+                    current_url = in_flight.pop(future)
+                    in_flight_normalized.discard(crawler.normalize_url(current_url))
+                    
+                    processed_count += 1
+                    # 総数計算: 処理済み + 現在のキュー内URL数 + 取得中のURL数
+                    total_count = processed_count + url_queue.size() + len(in_flight)
+                    logger.info("[%d/%d] 処理中: (%s)", processed_count, total_count, current_url)
+                    
+                    # 標準出力には一定件数ごとに進捗のみを表示する
+                    if processed_count % progress_interval == 0:
+                        print(f"進捗: {processed_count}/{total_count} ページ"
+                              f"（成功: {success_count}, 失敗: {failed_count}）")
+                    
+                    try:
+                        # ページを取得（パブリックAPIを使用）
+                        html_content = future.result()
+                    except Exception as e:
+                        error = FileSystemError(
+                            message="ページ処理中の予期しないエラー",
+                            file_path="unknown",
+                            severity=ErrorSeverity.MEDIUM,
+                            original_exception=e
+                        )
+                        self.error_handler.handle_error(error)
+                        failed_count += 1
+                        continue
+                    
+                    if html_content is None:
+                        failed_count += 1
+                        continue
+                    
+                    if html_content is SKIPPED:
+                        skipped_count += 1
+                        continue
+                    
+                    if html_content is NOT_MODIFIED:
+                        # 変更がなければ前回の出力をそのまま使い、前回抽出したリンクをたどる
+                        if crawler.mark_url_as_visited(current_url):
+                            self.recovery_manager.record_visited(current_url)
+                        crawled_urls.append(current_url)
+                        not_modified_count += 1
+                        logger.info("前回から変更がないため変換を省略: %s", current_url)
+                        crawler.enqueue_links(crawler.cached_links(current_url))
+                        continue
+                    
+                    # 訪問済みとしてマーク（パブリックAPIを使用）
+                    if crawler.mark_url_as_visited(current_url):
+                        self.recovery_manager.record_visited(current_url)
+                    crawled_urls.append(current_url)  # 成功したURLを記録
+                    
+                    # 変換・保存とリンク抽出は変換ワーカーで行う
+                    converting[convert_pool.submit(convert_page, current_url, html_content)] = current_url
         
         # 処理時間の計算
         end_time = time.time()
@@ -253,12 +342,64 @@ class DocToMarkdownTool:
             'processed': processed_count,
             'success_count': success_count,
             'failed_count': failed_count,
+            'duplicate_count': duplicate_count,
+            'not_modified_count': not_modified_count,
+            'skipped_count': skipped_count,
             'crawled_urls': crawled_urls,
             'crawler_stats': self.crawler.get_stats(),
             'converter_stats': self.converter.get_stats(),
             'processing_time': processing_time
         }
     
+    def _convert_page(self, url: str, html_content: str) -> Tuple[Optional[Path], List[Tuple[str, int]], Optional[str]]:
+        """ページの変換・保存とリンク抽出を行う（変換ワーカーのスレッドで実行）
+        
+        HTMLは一度だけ解析し、変換で不要な要素（nav等）が除去される前にリンクを抽出する。
+        ワーカープロセスを使う場合は、変換をプロセスに任せている間にこのスレッドでリンクを抽出する。
+        重複ページの検出が有効な場合、既出のページと重複するページは変換せず、そのURLを3つ目の値として返す。
+        """
+        converter = self.converter
+        
+        if self._process_pool is not None and not converter.dedup_enabled:
+            future = self._process_pool.submit(process_page_in_worker, url, html_content)
+            links = self.crawler.extract_links_from_content(url, html_content)
+            file_path, stats, error_stats = future.result()
+            converter.merge_stats(stats, error_stats)
+            return file_path, links, None
+        
+        soup = BeautifulSoup(html_content, 'lxml')
+        links = self.crawler.extract_links_from_soup(url, soup)
+        
+        duplicate_of = converter.find_duplicate(url, soup)
+        if duplicate_of is not None:
+            return None, links, duplicate_of
+        
+        if self._process_pool is not None:
+            file_path, stats, error_stats = self._process_pool.submit(
+                process_page_in_worker, url, html_content).result()
+            converter.merge_stats(stats, error_stats)
+        else:
+            file_path = converter.process_page_from_soup(url, soup)
+        return file_path, links, None
+    
+    def _next_url(self, in_flight_normalized: Set[str]) -> Optional[str]:
+        """キューから未訪問かつ取得中でないURLを1件取り出す（キューが空ならNone）"""
+        crawler = self.crawler
+        url_queue = crawler.url_queue
+        
+        # get()は空のキューに対してNoneを返すため、empty()による事前確認は不要
+        while (url := url_queue.get()) is not None:
+            # 重複チェック（パブリックAPIを使用）
+            normalized = crawler.normalize_url(url)
+            if normalized in in_flight_normalized or crawler.is_url_visited(url):
+                crawler.stats['total_skipped'] += 1
+                continue
+            
+            in_flight_normalized.add(normalized)
+            return url
+        
+        return None
+    
     def _display_results(self, result):
         """処理結果を表示"""
         output_config = self.config_manager.get_output_config()
@@ -267,10 +408,18 @@ class DocToMarkdownTool:
         print(f"処理ページ数: {result['processed']}")
         print(f"変換成功: {result['success_count']}")
         print(f"変換失敗: {result['failed_count']}")
+        if result['duplicate_count'] > 0:
+            print(f"重複スキップ: {result['duplicate_count']}")
+        if result['not_modified_count'] > 0:
+            print(f"未変更スキップ: {result['not_modified_count']}")
+        if result['skipped_count'] > 0:
+            print(f"対象外スキップ: {result['skipped_count']}")
         
-        # 成功率の計算
-        if result['processed'] > 0:
-            success_rate = (result['success_count'] / result['processed']) * 100
+        # 成功率の計算（取得対象外・未変更・重複のページは分母に含めない）
+        attempted = (result['processed'] - result['skipped_count']
+                     - result['not_modified_count'] - result['duplicate_count'])
+        if attempted > 0:
+            success_rate = (result['success_count'] / attempted) * 100
             print(f"成功率: {success_rate:.1f}%")
         
         # 画像統計
@@ -343,12 +492,8 @@ class DocToMarkdownTool:
             self.logger.error(f"中断時の状態保存に失敗: {e}")
 
 
-def main():
-    """メイン関数"""
-    parser = argparse.ArgumentParser(
-        description='技術ドキュメント一括Markdown化ツール',
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+# ヘルプに表示する使用例
+EPILOG = """
 使用例:
   python main.py                                    # config.yamlを使用
   python main.py config_samples/python_docs.yaml   # 引数で設定ファイルを指定
@@ -358,7 +503,16 @@ def main():
   config_samples/python_docs.yaml  - Python公式ドキュメント用
   config_samples/docs_general.yaml - 一般的なドキュメントサイト用
   config_samples/minimal.yaml      - 最小設定例
-        """)
+        """
+
+
+@functools.cache
+def _build_parser() -> argparse.ArgumentParser:
+    """コマンドライン引数のパーサーを構築（プロセス内で一度だけ）"""
+    parser = argparse.ArgumentParser(
+        description='技術ドキュメント一括Markdown化ツール',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=EPILOG)
     
     parser.add_argument(
         'config_file', 
@@ -371,10 +525,21 @@ def main():
         dest='config_file',
         help='設定ファイルのパス (引数と同じ)'
     )
+    parser.add_argument(
+        '--config-cache',
+        action='store_true',
+        help=f'解析済みの設定ファイルをキャッシュする (保存先: {ConfigManager.DEFAULT_CACHE_DIR})'
+    )
     
-    args = parser.parse_args()
+    return parser
+
+
+def main():
+    """メイン関数"""
+    args = _build_parser().parse_args()
     
-    tool = DocToMarkdownTool(args.config_file)
+    config_cache_dir = ConfigManager.DEFAULT_CACHE_DIR if args.config_cache else None
+    tool = DocToMarkdownTool(args.config_file, config_cache_dir=config_cache_dir)
     try:
         tool.run()
     except KeyboardInterrupt:
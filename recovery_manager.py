@@ -3,18 +3,83 @@
 処理の進行状況を保存し、中断からの復旧を可能にする
 """
 
+import gzip
+import hashlib
 import json
 import os
+import queue
+import sqlite3
+import threading
 import time
 import logging
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Set
-from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+try:
+    import orjson  # 任意依存: orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard  # 任意依存: zstandard
+except ImportError:
+    zstandard = None
+
+# 圧縮形式の判別に使う先頭バイト
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_GZIP_MAGIC = b'\x1f\x8b'
+# スナップショット先頭のダイジェストヘッダー（マジック + blake2bダイジェスト64バイト）
+_DIGEST_MAGIC = b'D2MSUM1\n'
+_DIGEST_SIZE = 64
+
+
+def _format_timestamp(now: float) -> str:
+    """UNIX時刻をローカル時刻のISO 8601形式（マイクロ秒付き）に変換"""
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)) + f'.{int(now % 1 * 1e6):06d}'
+
+
+def _pack_urls(urls: Set[str]) -> Dict[str, Any]:
+    """URL集合を共通接頭辞と接尾辞のリストに圧縮"""
+    sorted_urls = sorted(urls)
+    # ソート済みなので先頭と末尾の共通接頭辞が全体の共通接頭辞になる
+    prefix = os.path.commonprefix([sorted_urls[0], sorted_urls[-1]]) if sorted_urls else ''
+    offset = len(prefix)
+    return {'prefix': prefix, 'suffixes': [url[offset:] for url in sorted_urls]}
+
+
+def _unpack_urls(packed: Any) -> Set[str]:
+    """_pack_urlsの出力（または旧形式のリスト）からURL集合を復元"""
+    if isinstance(packed, dict):
+        prefix = packed.get('prefix', '')
+        suffixes = packed.get('suffixes', [])
+        if not prefix:
+            # 連結が不要ならリストから直接集合を作る
+            return set(suffixes)
+        return {prefix + suffix for suffix in suffixes}
+    return set(packed)
 
 
 class RecoveryState:
     """リカバリ状態を管理するクラス"""
     
+    __slots__ = ('start_url', 'visited_urls', 'failed_url_counts', 'processed_count',
+                 'success_count', 'failed_count', 'crawled_urls', 'timestamp', 'config_checksum')
+    
+    # 保存形式のバージョン（2: visited_urlsを接頭辞圧縮, 3: crawled_urlsを別ファイルに分離）
+    FORMAT_VERSION = 3
+    
+    # visited_urls以外のフィールドと、既定値を生成する型
+    _FIELDS = (
+        ('start_url', str),
+        ('failed_url_counts', dict),
+        ('processed_count', int),
+        ('success_count', int),
+        ('failed_count', int),
+        ('crawled_urls', list),
+        ('timestamp', str),
+        ('config_checksum', str),
+    )
+    
     def __init__(self):
         self.start_url: str = ""
         self.visited_urls: Set[str] = set()
@@ -28,34 +93,122 @@ class RecoveryState:
     
     def to_dict(self) -> Dict[str, Any]:
         """状態を辞書形式に変換"""
-        return {
-            'start_url': self.start_url,
-            'visited_urls': list(self.visited_urls),
-            'failed_url_counts': self.failed_url_counts,
-            'processed_count': self.processed_count,
-            'success_count': self.success_count,
-            'failed_count': self.failed_count,
-            'crawled_urls': self.crawled_urls,
-            'timestamp': self.timestamp,
-            'config_checksum': self.config_checksum
+        data = {
+            'format_version': self.FORMAT_VERSION,
+            'visited_urls': _pack_urls(self.visited_urls)
         }
+        for name, _ in self._FIELDS:
+            data[name] = getattr(self, name)
+        return data
+    
+    def snapshot(self) -> 'RecoveryState':
+        """書き込み用にコレクションを複製した状態を返す
+        
+        crawled_urlsは別ファイルに追記していくため複製しない。
+        """
+        copied = RecoveryState()
+        copied.start_url = self.start_url
+        copied.visited_urls = self.visited_urls.copy()
+        copied.failed_url_counts = self.failed_url_counts.copy()
+        copied.processed_count = self.processed_count
+        copied.success_count = self.success_count
+        copied.failed_count = self.failed_count
+        copied.timestamp = self.timestamp
+        copied.config_checksum = self.config_checksum
+        return copied
     
     def from_dict(self, data: Dict[str, Any]):
         """辞書から状態を復元"""
-        self.start_url = data.get('start_url', '')
-        self.visited_urls = set(data.get('visited_urls', []))
-        self.failed_url_counts = data.get('failed_url_counts', {})
-        self.processed_count = data.get('processed_count', 0)
-        self.success_count = data.get('success_count', 0)
-        self.failed_count = data.get('failed_count', 0)
-        self.crawled_urls = data.get('crawled_urls', [])
-        self.timestamp = data.get('timestamp', '')
-        self.config_checksum = data.get('config_checksum', '')
+        visited_urls = data.get('visited_urls', [])
+        if data.get('format_version', 1) >= 2:
+            self.visited_urls = _unpack_urls(visited_urls)
+        else:
+            self.visited_urls = set(visited_urls)
+        for name, default in self._FIELDS:
+            value = data.get(name)
+            setattr(self, name, default() if value is None else value)
+
+
+class SQLiteStateStore:
+    """リカバリ状態をSQLiteに保存するストア
+    
+    訪問済み・変換済みURLは追加分だけをINSERTし、カウンタ等はmetaテーブルに
+    保持するため、保存のたびに状態全体を直列化する必要がない。
+    接続は最初の書き込み・読み込み時に開き、delete()でファイルごと削除できる。
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """接続を開いてテーブルを用意（ロック取得済みで呼ぶ）"""
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS visited(url TEXT PRIMARY KEY)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS crawled(seq INTEGER PRIMARY KEY, url TEXT NOT NULL)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS failed(url TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)')
+        return self._db
+    
+    def write(self, entry: Dict[str, Any], crawled_start: int, new_crawled: List[str],
+              reset: bool = False, durable: bool = False):
+        """差分を1回のトランザクションで反映（reset=Trueなら既存の記録を消してから書き込む）"""
+        meta = {key: entry[key] for key in
+                ('start_url', 'processed_count', 'success_count', 'failed_count',
+                 'timestamp', 'config_checksum')}
+        with self._lock:
+            db = self._connect()
+            with db:
+                if reset:
+                    db.execute('DELETE FROM visited')
+                    db.execute('DELETE FROM failed')
+                db.executemany('INSERT OR IGNORE INTO visited VALUES(?)',
+                               ((url,) for url in entry['new_visited']))
+                db.execute('DELETE FROM crawled WHERE seq >= ?', (crawled_start,))
+                db.executemany('INSERT INTO crawled VALUES(?, ?)',
+                               enumerate(new_crawled, crawled_start))
+                db.executemany('INSERT OR REPLACE INTO failed VALUES(?, ?)',
+                               entry['failed_url_counts'].items())
+                db.executemany('INSERT OR REPLACE INTO meta VALUES(?, ?)',
+                               ((key, json.dumps(value)) for key, value in meta.items()))
+            if durable:
+                # WALの内容を本体に書き戻し、ディスクへの反映を確定させる
+                db.execute('PRAGMA wal_checkpoint(FULL)')
+    
+    def read(self) -> Dict[str, Any]:
+        """保存内容をJSON形式のリカバリファイルと同じ構造の辞書で返す"""
+        with self._lock:
+            db = self._connect()
+            data: Dict[str, Any] = {key: json.loads(value)
+                                    for key, value in db.execute('SELECT key, value FROM meta')}
+            data['visited_urls'] = [url for (url,) in db.execute('SELECT url FROM visited')]
+            data['crawled_urls'] = [url for (url,) in db.execute('SELECT url FROM crawled ORDER BY seq')]
+            data['failed_url_counts'] = dict(db.execute('SELECT url, count FROM failed'))
+        return data
+    
+    def delete(self):
+        """接続を閉じてデータベースファイルを削除"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self.db_path + suffix)
+                except FileNotFoundError:
+                    pass
 
 
 class RecoveryManager:
     """リカバリ機能の管理クラス"""
     
+    # 差分ログへの追記がこの回数に達したらスナップショットを書き直してログを畳む
+    COMPACT_EVERY = 50
+    
     def __init__(self, config: Dict[str, Any], logger: Optional[logging.Logger] = None):
         self.config = config
         self.recovery_config = config.get('recovery', {})
@@ -63,12 +216,69 @@ class RecoveryManager:
         
         self.recovery_file = Path(self.recovery_config.get('recovery_file', './recovery_state.json'))
         self.save_interval = self.recovery_config.get('save_interval', 10)
+        self.save_interval_seconds = self.recovery_config.get('save_interval_seconds', 30.0)
         self.enable_recovery = self.recovery_config.get('enable_recovery', True)
+        self.compress_state = self.recovery_config.get('compress_state', True)
         
         self.state = RecoveryState()
         self.save_counter = 0
+        self._last_save_time = time.monotonic()
+        # 最後に書き込んだ状態の指紋（変化がなければ書き込みを省略する）
+        self._last_saved_fingerprint = None
+        
+        # 書き込みのたびにPathを組み立てないよう、パス文字列を先に用意しておく
+        self._recovery_path_str = os.fspath(self.recovery_file)
+        self._temp_path_str = self._recovery_path_str + '.tmp'
+        # 以前の形式で本体とは別に書き出していたダイジェスト（削除時の後始末用）
+        self._sum_path_str = self._recovery_path_str + '.sum'
+        if self.enable_recovery:
+            try:
+                self.recovery_file.parent.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                self.logger.warning(f"リカバリファイルのディレクトリ作成に失敗: {e}")
+        
+        # storage: sqliteの場合はJSONファイルの代わりにSQLiteへ差分を書き込む
+        self.storage = self.recovery_config.get('storage', 'json')
+        self._store: Optional[SQLiteStateStore] = None
+        if self.storage == 'sqlite':
+            self._store = SQLiteStateStore(os.fspath(self.recovery_file.with_suffix('.db')))
+        self._state_path_str = self._store.db_path if self._store else self._recovery_path_str
+        
+        # 差分ログ: スナップショット以降に追加されたURLだけを追記する
+        self.delta_log_file = self.recovery_file.with_name(self.recovery_file.name + '.log')
+        self._delta_log_path_str = os.fspath(self.delta_log_file)
+        # crawled_urlsは追記専用のテキストファイル（1行1URL）に書き出す
+        self.crawled_urls_file = self.recovery_file.with_suffix('.urls.txt')
+        self._crawled_urls_path_str = os.fspath(self.crawled_urls_file)
+        self._has_snapshot = False
+        self._deltas_since_snapshot = 0
+        # スナップショットの世代番号。差分ログの各行にも記録し、
+        # 別の世代のスナップショットに対する差分を再適用しないようにする
+        self._generation = 0
+        # 保存済みの訪問URL数と、それ以降に訪問したURL（record_visitedで追記）
+        self._persisted_visited_count = 0
+        self._pending_visited: List[str] = []
+        self._persisted_crawled_len = 0
+        self._persisted_failed: Dict[str, int] = {}
+        # can_resume()で検証済みのリカバリファイルの内容
+        self._loaded_data: Optional[Dict[str, Any]] = None
+        # can_resume()の判定結果 (mtime_ns, size, 結果)
+        self._resume_cache: Optional[Tuple[int, int, bool]] = None
+        # 設定は実行中に変化しないため、チェックサムは一度だけ計算して使い回す
+        self._cached_checksum = self._compute_config_checksum_once()
+        
+        # ファイルへの書き込みは専用スレッドで行い、クロールのループを止めない
+        self._save_queue: queue.Queue = queue.Queue()
+        self._write_failed = False
+        if self.enable_recovery:
+            threading.Thread(target=self._writer_loop, name='recovery-writer',
+                             daemon=True).start()
     
     def _calculate_config_checksum(self) -> str:
+        """設定のチェックサムを取得"""
+        return self._cached_checksum
+    
+    def _compute_config_checksum_once(self) -> str:
         """設定のチェックサムを計算"""
         # 設定の主要部分をJSON文字列化してハッシュ
         key_config = {
@@ -77,46 +287,137 @@ class RecoveryManager:
             'extractor': self.config.get('extractor', {}),
             'output': self.config.get('output', {})
         }
-        import hashlib
         config_str = json.dumps(key_config, sort_keys=True)
-        return hashlib.md5(config_str.encode()).hexdigest()
+        return hashlib.blake2b(config_str.encode(), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _serialize(data: Dict[str, Any]) -> bytes:
+        """状態をJSONのバイト列に変換（orjsonがあれば使用）"""
+        # 機械が読むファイルなので整形せずコンパクトに出力する
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    
+    @staticmethod
+    def _serialize_line(data: Dict[str, Any]) -> bytes:
+        """差分ログ用に1行のJSONへ変換"""
+        if orjson is not None:
+            return orjson.dumps(data) + b'\n'
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+    
+    def _compress(self, raw: bytes) -> bytes:
+        """スナップショットを圧縮（zstandardがあれば使用、なければgzip）"""
+        if not self.compress_state:
+            return raw
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=3).compress(raw)
+        return gzip.compress(raw, compresslevel=1)
+    
+    @staticmethod
+    def _decompress(raw: bytes) -> bytes:
+        """先頭バイトから圧縮形式を判別して展開（非圧縮ならそのまま返す）"""
+        if raw.startswith(_ZSTD_MAGIC):
+            if zstandard is None:
+                raise RuntimeError("zstd形式のリカバリファイルを読むにはzstandardが必要です")
+            return zstandard.ZstdDecompressor().decompress(raw)
+        if raw.startswith(_GZIP_MAGIC):
+            return gzip.decompress(raw)
+        return raw
+    
+    def _read_state_file(self) -> Dict[str, Any]:
+        """リカバリファイルを読み込んで辞書として返す（orjsonがあれば使用）"""
+        if self._store is not None:
+            return self._store.read()
+        with open(self.recovery_file, 'rb') as f:
+            raw = f.read()
+        
+        # 展開・解析の前にダイジェストを照合し、破損していれば即座に失敗させる
+        # （ヘッダーのない旧形式のファイルはそのまま読み込む）
+        if raw.startswith(_DIGEST_MAGIC):
+            body_start = len(_DIGEST_MAGIC) + _DIGEST_SIZE
+            expected = raw[len(_DIGEST_MAGIC):body_start]
+            raw = raw[body_start:]
+            if hashlib.blake2b(raw).digest() != expected:
+                raise ValueError("リカバリファイルが破損しています（ダイジェスト不一致）")
+        
+        raw = self._decompress(raw)
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw.decode('utf-8'))
     
     def has_recovery_file(self) -> bool:
         """リカバリファイルが存在するかチェック"""
-        return self.recovery_file.exists() and self.enable_recovery
+        return self.enable_recovery and os.path.exists(self._state_path_str)
     
-    def can_resume(self) -> bool:
-        """再開可能かどうかを判定"""
+    def _read_and_validate(self) -> Optional[Dict[str, Any]]:
+        """リカバリファイルを読み込んで検証し、使用可能なら内容を返す
+        
+        can_resume()とload_state()が続けて呼ばれても一度だけ読み込むよう、
+        検証済みの内容はload_state()で取り込まれるまで保持する。
+        """
         if not self.has_recovery_file():
-            return False
+            return None
+        if self._loaded_data is not None:
+            return self._loaded_data
         
         try:
-            with open(self.recovery_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            saved_checksum = data.get('config_checksum', '')
-            current_checksum = self._calculate_config_checksum()
-            
-            if saved_checksum != current_checksum:
-                self.logger.warning("設定が変更されているため、リカバリファイルは使用できません")
-                return False
-            
-            return True
-            
+            data = self._read_state_file()
         except Exception as e:
             self.logger.error(f"リカバリファイルの検証に失敗: {e}")
+            return None
+        
+        if data.get('config_checksum', '') != self._calculate_config_checksum():
+            self.logger.warning("設定が変更されているため、リカバリファイルは使用できません")
+            return None
+        
+        self._loaded_data = data
+        return data
+    
+    def can_resume(self) -> bool:
+        """再開可能かどうかを判定"""
+        if not self.enable_recovery:
+            return False
+        try:
+            st = os.stat(self._state_path_str)
+        except OSError:
             return False
+        
+        # ファイルが変わっていなければ前回の判定結果をそのまま返す
+        key = (st.st_mtime_ns, st.st_size)
+        if self._resume_cache is not None and self._resume_cache[:2] == key:
+            return self._resume_cache[2]
+        
+        result = self._read_and_validate() is not None
+        self._resume_cache = (*key, result)
+        return result
     
     def load_state(self) -> bool:
         """保存された状態を読み込み"""
-        if not self.can_resume():
+        data = self._read_and_validate()
+        if data is None:
             return False
+        # 取り込んだ後は保持しておく必要がない
+        self._loaded_data = None
         
         try:
-            with open(self.recovery_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
             self.state.from_dict(data)
+            crawled_count = data.get('crawled_count')
+            # 旧形式のファイルには世代番号がない（差分ログにもないため、そのまま適用される）
+            generation = data.get('generation')
+            self._generation = generation or 0
+            logged_count = self._replay_delta_log(generation) if self._store is None else None
+            if logged_count is not None:
+                crawled_count = logged_count
+            # 旧形式のファイルではcrawled_urlsが本体に含まれている
+            crawled_in_sync = True
+            if 'crawled_urls' not in data:
+                crawled_in_sync = self._load_crawled_urls(crawled_count)
+            self._mark_persisted(self.state.visited_urls, self.state.crawled_urls,
+                                 self.state.failed_url_counts)
+            if not crawled_in_sync:
+                # 別ファイルの内容が本体より先行していた場合は次回の保存で書き直す
+                self._persisted_crawled_len = 0
+            self._has_snapshot = True
             
             self.logger.info("=== リカバリ状態を読み込み ===")
             self.logger.info(f"前回の実行時刻: {self.state.timestamp}")
@@ -138,49 +439,317 @@ class RecoveryManager:
                    processed_count: int,
                    success_count: int,
                    failed_count: int,
-                   crawled_urls: List[str]):
-        """現在の状態を保存"""
+                   crawled_urls: List[str],
+                   durable: bool = False):
+        """現在の状態を保存
+        
+        通常の保存ではfsyncを省略する。クラッシュ時には直近の保存内容が
+        失われうるが、置き換え自体はアトミックなので既存のリカバリファイルが
+        壊れることはない。durable=Trueの場合はインターバルに関係なく全体を
+        書き出し、ディスクへ反映されるまで待つ。
+        """
         if not self.enable_recovery:
             return
         
+        if durable:
+            self._write_state(start_url, visited_urls, failed_url_counts,
+                              processed_count, success_count, failed_count, crawled_urls,
+                              durable=True)
+            self.flush()
+            return
+        
         self.save_counter += 1
         
-        # 設定されたインターバルでのみ保存
+        # 設定されたページ数ごと、または前回の保存から一定時間が経過した場合にのみ保存
         if self.save_counter % self.save_interval != 0:
+            if not self.save_interval_seconds:
+                return
+            if time.monotonic() - self._last_save_time < self.save_interval_seconds:
+                return
+        
+        # 前回の保存から状態が変化していなければ書き込み不要
+        fingerprint = (processed_count, success_count, failed_count,
+                       len(visited_urls), len(crawled_urls))
+        if fingerprint == self._last_saved_fingerprint:
             return
         
+        self._write_state(start_url, visited_urls, failed_url_counts,
+                          processed_count, success_count, failed_count, crawled_urls)
+    
+    def _write_state(self,
+                     start_url: str,
+                     visited_urls: Set[str],
+                     failed_url_counts: Dict[str, int],
+                     processed_count: int,
+                     success_count: int,
+                     failed_count: int,
+                     crawled_urls: List[str],
+                     durable: bool = False):
+        """状態の書き込みを書き込みスレッドに依頼する
+        
+        通常は前回保存以降の差分だけを差分ログに追記し、一定回数ごと
+        （またはdurable=True）にスナップショット全体を書き直す。
+        SQLiteに保存する場合は常に差分だけを書き込む。
+        """
         try:
+            # 前回までに書き込んだ内容を土台にできない場合は全体を書き直す
+            must_rewrite = (self._write_failed
+                            or not self._has_snapshot
+                            or start_url != self.state.start_url
+                            or len(visited_urls) != (self._persisted_visited_count
+                                                     + len(self._pending_visited))
+                            or len(crawled_urls) < self._persisted_crawled_len
+                            or len(failed_url_counts) < len(self._persisted_failed))
+            
+            # 以降はファイルの内容が変わるため、読み込み済みの内容は破棄する
+            self._loaded_data = None
+            self._resume_cache = None
+            
+            # 別のリストが渡された場合はcrawled_urlsのファイルを先頭から書き直す
+            if must_rewrite or crawled_urls is not self.state.crawled_urls:
+                self._persisted_crawled_len = 0
+            crawled_start = self._persisted_crawled_len
+            new_crawled = crawled_urls[crawled_start:]
+            
             self.state.start_url = start_url
-            self.state.visited_urls = visited_urls.copy()
-            self.state.failed_url_counts = failed_url_counts.copy()
+            self.state.visited_urls = visited_urls
             self.state.processed_count = processed_count
             self.state.success_count = success_count
             self.state.failed_count = failed_count
-            self.state.crawled_urls = crawled_urls.copy()
-            self.state.timestamp = datetime.now().isoformat()
+            self.state.crawled_urls = crawled_urls
+            self.state.timestamp = _format_timestamp(time.time())
             self.state.config_checksum = self._calculate_config_checksum()
             
-            # 親ディレクトリを作成
-            self.recovery_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 一時ファイルに書き込んでから置き換え（アトミック操作）
-            temp_file = self.recovery_file.with_suffix('.tmp')
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state.to_dict(), f, ensure_ascii=False, indent=2)
+            # 失敗カウントは取得スレッドからも更新されるため、小さな辞書のみ複製しておく
+            self.state.failed_url_counts = dict(failed_url_counts)
             
-            temp_file.replace(self.recovery_file)
+            if self._store is not None:
+                if must_rewrite:
+                    self._pending_visited = list(visited_urls)
+                    self._persisted_visited_count = 0
+                    self._persisted_failed = {}
+                entry = self._build_delta()
+                entry['start_url'] = start_url
+                entry['config_checksum'] = self.state.config_checksum
+                self._save_queue.put(('sqlite', (entry, must_rewrite),
+                                      (crawled_start, new_crawled), durable))
+                self._has_snapshot = True
+            elif must_rewrite or durable or self._deltas_since_snapshot >= self.COMPACT_EVERY:
+                # 書き込み中もクロールが続くため、コレクションを複製して渡す
+                self._generation += 1
+                self._save_queue.put(('snapshot', (self.state.snapshot(), self._generation),
+                                      (crawled_start, new_crawled), durable))
+                self._has_snapshot = True
+                self._deltas_since_snapshot = 0
+                self._mark_persisted(visited_urls, crawled_urls, self.state.failed_url_counts)
+            else:
+                entry = self._build_delta()
+                entry['generation'] = self._generation
+                self._save_queue.put(('delta', entry, (crawled_start, new_crawled), False))
             
+            self._last_saved_fingerprint = (processed_count, success_count, failed_count,
+                                            len(visited_urls), len(crawled_urls))
+            self._last_save_time = time.monotonic()
             self.logger.debug(f"リカバリ状態を保存: {processed_count}ページ処理済み")
             
         except Exception as e:
             self.logger.error(f"リカバリ状態の保存に失敗: {e}")
     
+    def _writer_loop(self):
+        """書き込み依頼を順番に処理する（専用スレッドで実行）"""
+        while True:
+            kind, payload, crawled, durable = self._save_queue.get()
+            try:
+                crawled_start, new_crawled = crawled
+                if kind == 'snapshot':
+                    state, generation = payload
+                    self._append_crawled_urls(crawled_start, new_crawled)
+                    self._write_snapshot(state, crawled_start + len(new_crawled),
+                                         generation, durable)
+                    self._write_failed = False
+                elif kind == 'sqlite':
+                    entry, reset = payload
+                    if reset or not self._write_failed:
+                        self._store.write(entry, crawled_start, new_crawled, reset, durable)
+                        self._write_failed = False
+                elif not self._write_failed:
+                    # 直前のスナップショットが失敗していれば、次のスナップショットまで差分は捨てる
+                    self._append_crawled_urls(crawled_start, new_crawled)
+                    self._append_delta(payload)
+            except Exception as e:
+                self._write_failed = True
+                self.logger.error(f"リカバリ状態の保存に失敗: {e}")
+            finally:
+                self._save_queue.task_done()
+    
+    def flush(self):
+        """依頼済みの書き込みがすべて完了するまで待機"""
+        if self.enable_recovery:
+            self._save_queue.join()
+    
+    def _write_snapshot(self, state: RecoveryState, crawled_count: int, generation: int,
+                        durable: bool = False):
+        """状態全体をリカバリファイルに書き込み、差分ログを破棄
+        
+        置き換えから差分ログの削除までの間に中断された場合でも、古い世代の
+        差分は読み込み時に無視されるため、スナップショットに重ねて適用されることはない。
+        """
+        # crawled_urlsは別ファイルにあるため件数だけを記録する
+        data = state.to_dict()
+        del data['crawled_urls']
+        data['crawled_count'] = crawled_count
+        data['generation'] = generation
+        
+        payload = self._compress(self._serialize(data))
+        
+        # 一時ファイルに書き込んでから置き換え（アトミック操作）
+        # ダイジェストは本体と同じファイルに書くため、内容と常に一緒に置き換わる
+        with open(self._temp_path_str, 'wb') as f:
+            f.write(_DIGEST_MAGIC)
+            f.write(hashlib.blake2b(payload).digest())
+            f.write(payload)
+            if durable:
+                # 置き換え前に内容をディスクへ確実に反映させる
+                f.flush()
+                os.fsync(f.fileno())
+        
+        os.replace(self._temp_path_str, self._recovery_path_str)
+        
+        # スナップショットに取り込まれた差分ログは不要
+        try:
+            os.remove(self._delta_log_path_str)
+        except FileNotFoundError:
+            pass
+    
+    def _build_delta(self) -> Dict[str, Any]:
+        """前回保存以降の差分を組み立て、反映済みの状態を進める"""
+        state = self.state
+        new_visited = self._pending_visited
+        self._pending_visited = []
+        changed_failed = {url: count for url, count in state.failed_url_counts.items()
+                          if self._persisted_failed.get(url) != count}
+        entry = {
+            'new_visited': new_visited,
+            'crawled_count': len(state.crawled_urls),
+            'failed_url_counts': changed_failed,
+            'processed_count': state.processed_count,
+            'success_count': state.success_count,
+            'failed_count': state.failed_count,
+            'timestamp': state.timestamp
+        }
+        
+        self._deltas_since_snapshot += 1
+        self._persisted_visited_count += len(new_visited)
+        self._persisted_crawled_len = len(state.crawled_urls)
+        self._persisted_failed.update(changed_failed)
+        return entry
+    
+    def record_visited(self, url: str):
+        """新たに訪問したURLを記録（次回の差分保存で書き出す）"""
+        if self.enable_recovery:
+            self._pending_visited.append(url)
+    
+    def _append_delta(self, entry: Dict[str, Any]):
+        """差分を差分ログに1行追記"""
+        with open(self._delta_log_path_str, 'ab') as f:
+            f.write(self._serialize_line(entry))
+    
+    def _append_crawled_urls(self, start: int, urls: List[str]):
+        """crawled_urlsの追加分を別ファイルに追記（start=0なら先頭から書き直す）"""
+        if start == 0:
+            mode = 'w'
+        elif urls:
+            mode = 'a'
+        else:
+            return
+        with open(self._crawled_urls_path_str, mode, encoding='utf-8') as f:
+            if urls:
+                f.write('\n'.join(urls))
+                f.write('\n')
+    
+    def _load_crawled_urls(self, crawled_count: Optional[int]) -> bool:
+        """別ファイルからcrawled_urlsを読み込み、ファイルと記録件数が一致するかを返す"""
+        try:
+            with open(self._crawled_urls_path_str, 'r', encoding='utf-8') as f:
+                urls = f.read().splitlines()
+        except FileNotFoundError:
+            urls = []
+        
+        in_sync = crawled_count is None or len(urls) == crawled_count
+        if crawled_count is not None and len(urls) > crawled_count:
+            # 本体の保存前に中断された分は捨てる
+            del urls[crawled_count:]
+        self.state.crawled_urls = urls
+        return in_sync
+    
+    def _mark_persisted(self,
+                        visited_urls: Set[str],
+                        crawled_urls: List[str],
+                        failed_url_counts: Dict[str, int]):
+        """ディスク上に反映済みの状態を記録"""
+        self._persisted_visited_count = len(visited_urls)
+        self._pending_visited = []
+        self._persisted_crawled_len = len(crawled_urls)
+        self._persisted_failed = dict(failed_url_counts)
+    
+    def _replay_delta_log(self, generation: Optional[int]) -> Optional[int]:
+        """差分ログのうちスナップショットと同じ世代の行を状態に適用し、
+        記録されたcrawled_urlsの件数を返す"""
+        if not self.delta_log_file.exists():
+            return None
+        
+        applied = 0
+        stale = 0
+        crawled_count = None
+        with open(self.delta_log_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = orjson.loads(line) if orjson is not None else json.loads(line)
+                except ValueError:
+                    # 書き込み途中で中断された末尾の行は捨てる
+                    self.logger.warning("差分ログの不完全な行を無視しました")
+                    break
+                
+                if entry.get('generation') != generation:
+                    # スナップショットに取り込み済みの古い世代の差分
+                    stale += 1
+                    continue
+                
+                self.state.visited_urls.update(entry.get('new_visited', []))
+                crawled_count = entry.get('crawled_count', crawled_count)
+                self.state.failed_url_counts.update(entry.get('failed_url_counts', {}))
+                self.state.processed_count = entry.get('processed_count', self.state.processed_count)
+                self.state.success_count = entry.get('success_count', self.state.success_count)
+                self.state.failed_count = entry.get('failed_count', self.state.failed_count)
+                self.state.timestamp = entry.get('timestamp', self.state.timestamp)
+                applied += 1
+        
+        self._has_snapshot = True
+        self._deltas_since_snapshot = applied
+        if stale:
+            self.logger.debug(f"古い世代の差分を無視: {stale}件")
+        self.logger.debug(f"差分ログを適用: {applied}件")
+        return crawled_count
+    
     def cleanup_recovery_file(self):
         """リカバリファイルを削除"""
+        # 書き込み待ちの状態が削除後に書き戻されないよう先に完了させる
+        self.flush()
         try:
+            if self._store is not None:
+                self._store.delete()
+            if self.delta_log_file.exists():
+                self.delta_log_file.unlink()
+            if self.crawled_urls_file.exists():
+                self.crawled_urls_file.unlink()
+            if os.path.exists(self._sum_path_str):
+                os.remove(self._sum_path_str)
             if self.recovery_file.exists():
                 self.recovery_file.unlink()
                 self.logger.info("リカバリファイルを削除しました")
+            self._has_snapshot = False
+            self._loaded_data = None
+            self._resume_cache = None
         except Exception as e:
             self.logger.warning(f"リカバリファイルの削除に失敗: {e}")
     
@@ -202,10 +771,6 @@ class RecoveryManager:
                                 failed_count: int,
                                 crawled_urls: List[str]):
         """インターバルに関係なく現在の状態を強制保存"""
-        original_counter = self.save_counter
-        self.save_counter = self.save_interval - 1  # 次回保存されるように調整
-        
-        self.save_state(start_url, visited_urls, failed_url_counts, 
-                       processed_count, success_count, failed_count, crawled_urls)
-        
-        self.save_counter = original_counter
\ No newline at end of file
+        self.save_state(start_url, visited_urls, failed_url_counts,
+                        processed_count, success_count, failed_count, crawled_urls,
+                        durable=True)